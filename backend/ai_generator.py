@@ -1,13 +1,131 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+import copy
+import hashlib
+import importlib
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+# The Anthropic SDK and httpx are imported on first use to keep import cheap
+if TYPE_CHECKING:
+    import anthropic
+    import httpx
+
+# Shared pool for running independent tool calls from one response in parallel,
+# started the first time a response asks for more than one tool
+_TOOL_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_TOOL_EXECUTOR_LOCK = threading.Lock()
+
+# Process-wide Anthropic clients keyed by API key, all sharing one HTTP pool
+_CLIENT_CACHE: Dict[str, "anthropic.Anthropic"] = {}
+_HTTP_CLIENT: Optional["httpx.Client"] = None
+
+# Async counterparts, created on the first async call
+_ASYNC_CLIENT_CACHE: Dict[str, "anthropic.AsyncAnthropic"] = {}
+_ASYNC_HTTP_CLIENT: Optional["httpx.AsyncClient"] = None
+
+
+def __getattr__(name: str):
+    """Resolve ai_generator.anthropic / ai_generator.httpx lazily (used by patches)"""
+    if name in ("anthropic", "httpx"):
+        return importlib.import_module(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _tool_executor() -> ThreadPoolExecutor:
+    """Return the shared tool executor, creating it on first use"""
+    global _TOOL_EXECUTOR
+    with _TOOL_EXECUTOR_LOCK:
+        if _TOOL_EXECUTOR is None:
+            _TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=4)
+    return _TOOL_EXECUTOR
+
+
+def _shared_httpx_client() -> "httpx.Client":
+    """Return the keep-alive HTTP pool shared by every cached client"""
+    import httpx
+
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        # Keep-alive pool so tool-use follow-up calls reuse the same TLS session
+        _HTTP_CLIENT = httpx.Client(
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=100,
+                keepalive_expiry=30.0,
+            ),
+            timeout=60.0,
+        )
+    return _HTTP_CLIENT
 
-import anthropic
 
+def _get_client(api_key: str) -> "anthropic.Anthropic":
+    """Return the cached Anthropic client for an API key, creating it once"""
+    import anthropic
 
-class AIGenerator:
-    """Handles interactions with Anthropic's Claude API for generating responses"""
+    client = _CLIENT_CACHE.get(api_key)
+    if client is None:
+        client = anthropic.Anthropic(
+            api_key=api_key, http_client=_shared_httpx_client()
+        )
+        _CLIENT_CACHE[api_key] = client
+    return client
+
+
+def _shared_async_httpx_client() -> "httpx.AsyncClient":
+    """Return the async HTTP pool shared by every cached async client"""
+    import httpx
+
+    global _ASYNC_HTTP_CLIENT
+    if _ASYNC_HTTP_CLIENT is None or _ASYNC_HTTP_CLIENT.is_closed:
+        # Concurrent queries share the event loop while waiting on Claude
+        _ASYNC_HTTP_CLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+            timeout=60.0,
+        )
+    return _ASYNC_HTTP_CLIENT
+
+
+def _get_async_client(api_key: str) -> "anthropic.AsyncAnthropic":
+    """Return the cached AsyncAnthropic client for an API key, creating it once"""
+    import anthropic
+
+    client = _ASYNC_CLIENT_CACHE.get(api_key)
+    if client is None:
+        client = anthropic.AsyncAnthropic(
+            api_key=api_key, http_client=_shared_async_httpx_client()
+        )
+        _ASYNC_CLIENT_CACHE[api_key] = client
+    return client
+
+
+async def aclose_http_clients():
+    """
+    Close the shared HTTP pools and forget every cached client.
 
-    # Static system prompt to avoid rebuilding on each call
-    SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to a comprehensive search tool for course information.
+    Call once when the process shuts down; generators created afterwards get
+    fresh pools.
+    """
+    global _HTTP_CLIENT, _ASYNC_HTTP_CLIENT
+
+    _CLIENT_CACHE.clear()
+    _ASYNC_CLIENT_CACHE.clear()
+    if _HTTP_CLIENT is not None:
+        _HTTP_CLIENT.close()
+        _HTTP_CLIENT = None
+    if _ASYNC_HTTP_CLIENT is not None:
+        await _ASYNC_HTTP_CLIENT.aclose()
+        _ASYNC_HTTP_CLIENT = None
+
+
+# Static system prompt, built once per process
+SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to a comprehensive search tool for course information.
 
 Search Tool Usage:
 - Use the search tool **only** for questions about specific course content or detailed educational materials
@@ -37,12 +155,250 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+# Cached system block sent with every call
+_SYSTEM_PROMPT_BLOCK = {
+    "type": "text",
+    "text": SYSTEM_PROMPT,
+    "cache_control": {"type": "ephemeral"},
+}
+
+
+class AIGenerator:
+    """Handles interactions with Anthropic's Claude API for generating responses"""
+
+    # Kept as a class attribute for callers that read AIGenerator.SYSTEM_PROMPT
+    SYSTEM_PROMPT = SYSTEM_PROMPT
+
+    # Maximum sequential tool-use rounds per query
+    MAX_TOOL_ROUNDS = 2
+
+    TOOL_ERROR_MESSAGE = "I encountered an issue while searching for additional information. Please try rephrasing your question."
+
+    # Number of direct (non tool-use) answers kept in the response cache
+    RESPONSE_CACHE_SIZE = 256
+
+    # Legacy model families that reject cache_control blocks
+    UNCACHEABLE_MODEL_PREFIXES = ("claude-2", "claude-instant")
+
+    # Message Batches API limit, status polling interval and default wait in
+    # seconds (the API expires unfinished batches after 24 hours)
+    MAX_BATCH_REQUESTS = 10_000
+    BATCH_POLL_INTERVAL = 30
+    BATCH_TIMEOUT = 24 * 60 * 60
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        routing_model: Optional[str] = None,
+        tool_manager=None,
+    ):
+        self.api_key = api_key
+        self.client = _get_client(api_key)
         self.model = model
 
-        # Pre-build base API parameters
-        self.base_params = {"model": self.model, "temperature": 0, "max_tokens": 800}
+        # Default tools for calls that don't pass their own
+        self.tool_manager = tool_manager
+
+        # An optional cheaper model decides whether to search (the main model
+        # by default); the main model writes every answer based on tool results
+        self.routing_model = routing_model or model
+        self.synthesis_model = model
+
+        # Pre-build base API parameters (read-only, copied into each call)
+        self.base_params = MappingProxyType(
+            {"model": self.model, "temperature": 0, "max_tokens": 800}
+        )
+
+        # Prompt caching is only enabled for models that support it
+        self.prompt_caching = not any(
+            name.startswith(self.UNCACHEABLE_MODEL_PREFIXES)
+            for name in (self.routing_model, self.synthesis_model)
+        )
+
+        # System blocks used by every call without history
+        self._system_blocks_nohistory = (_SYSTEM_PROMPT_BLOCK,)
+
+        # (caller's tools list, cache-marked copy) from the last call
+        self._cached_tools = None
+
+        # LRU of answers that did not depend on tool results; FastAPI runs
+        # sync queries in a threadpool, so every access holds the lock
+        self._response_cache: OrderedDict[str, str] = OrderedDict()
+        self._response_cache_lock = threading.Lock()
+
+    @property
+    def aclient(self) -> "anthropic.AsyncAnthropic":
+        """Async client for this API key, created on the first async call"""
+        return _get_async_client(self.api_key)
+
+    def close(self):
+        """
+        Drop this generator's cached sync and async clients.
+
+        The HTTP pools are shared with every other cached client and stay
+        open; they are closed once at shutdown by aclose_http_clients.
+        """
+        if _CLIENT_CACHE.get(self.api_key) is self.client:
+            del _CLIENT_CACHE[self.api_key]
+        _ASYNC_CLIENT_CACHE.pop(self.api_key, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _prepare_tools(self, tools: List) -> List:
+        """
+        Return tool definitions with a cache breakpoint on the last tool.
+
+        The caller's list is never mutated. The marked copy is memoized against
+        a snapshot of the definitions, so a tool manager that builds a fresh but
+        equal list on every call still reuses it.
+        """
+        if not self.prompt_caching:
+            return tools
+
+        if self._cached_tools is not None:
+            snapshot, marked_tools = self._cached_tools
+            if snapshot == tools:
+                return marked_tools
+
+        snapshot = copy.deepcopy(list(tools))
+        marked_tools = copy.deepcopy(snapshot)
+        marked_tools[-1]["cache_control"] = {"type": "ephemeral"}
+
+        self._cached_tools = (snapshot, marked_tools)
+        return marked_tools
+
+    def _response_cache_key(
+        self, query: str, conversation_history: Optional[str], tools: Optional[List]
+    ) -> str:
+        """Hash the inputs that determine a direct answer"""
+        tool_names = ",".join(tool["name"] for tool in tools) if tools else ""
+        key_text = "\0".join(
+            (self.routing_model, query.strip(), conversation_history or "", tool_names)
+        )
+        return hashlib.blake2b(key_text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _get_cached_response(self, cache_key: str) -> Optional[str]:
+        """Return a cached answer and mark it as recently used"""
+        with self._response_cache_lock:
+            response_text = self._response_cache.get(cache_key)
+            if response_text is not None:
+                self._response_cache.move_to_end(cache_key)
+            return response_text
+
+    def _cache_response(self, cache_key: str, response_text: str):
+        """Store an answer, evicting the least recently used one when full"""
+        with self._response_cache_lock:
+            self._response_cache[cache_key] = response_text
+            self._response_cache.move_to_end(cache_key)
+            if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+
+    def _build_system(self, conversation_history: Optional[str] = None):
+        """
+        Build the system parameter for a messages.create call.
+
+        With prompt caching enabled the static prompt becomes a cached text block
+        and the history, which changes every turn, follows as an uncached block.
+        """
+        if not self.prompt_caching:
+            if not conversation_history:
+                return SYSTEM_PROMPT
+            return "".join(
+                (SYSTEM_PROMPT, "\n\nPrevious conversation:\n", conversation_history)
+            )
+
+        if not conversation_history:
+            return self._system_blocks_nohistory
+
+        return [
+            *self._system_blocks_nohistory,
+            {"type": "text", "text": "Previous conversation:\n" + conversation_history},
+        ]
+
+    def _with_cache_breakpoint(
+        self, messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Return messages with a cache breakpoint on the second-to-last message.
+
+        The marker is applied to a copy so it moves forward each round instead of
+        piling up on earlier messages; the conversation prefix up to the previous
+        assistant turn is then read from the prompt cache.
+        """
+        if not self.prompt_caching or len(messages) < 2:
+            return messages
+
+        message = messages[-2]
+        content = message["content"]
+        cache_control = {"type": "ephemeral"}
+
+        if isinstance(content, str):
+            marked_content = [
+                {"type": "text", "text": content, "cache_control": cache_control}
+            ]
+        else:
+            if not content:
+                return messages
+
+            last_block = content[-1]
+            # SDK content blocks are pydantic models and need converting to params
+            if isinstance(last_block, BaseModel):
+                last_block = last_block.model_dump(exclude_none=True)
+            elif not isinstance(last_block, dict):
+                return messages
+
+            marked_content = [
+                *content[:-1],
+                {**last_block, "cache_control": cache_control},
+            ]
+
+        return [*messages[:-2], {**message, "content": marked_content}, messages[-1]]
+
+    def _resolve_tools(self, tools: Optional[List], tool_manager):
+        """
+        Pick the tools and manager for a call.
+
+        Calls that pass neither fall back to the manager given at construction.
+        Tools without a manager to run them are dropped with a warning.
+        """
+        if tools is None and tool_manager is None and self.tool_manager:
+            return self.tool_manager.get_tool_definitions(), self.tool_manager
+
+        if tools and not tool_manager:
+            warnings.warn(
+                "tools were passed without a tool_manager; calling Claude without tools",
+                RuntimeWarning,
+                stacklevel=3,
+            )
+            return None, None
+        return tools, tool_manager
+
+    def _build_api_params(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+    ) -> Dict[str, Any]:
+        """Build messages.create parameters for the initial call of a query"""
+        # Prepare API call parameters efficiently
+        api_params = {
+            **self.base_params,
+            "model": self.routing_model,
+            "messages": [{"role": "user", "content": query}],
+            "system": self._build_system(conversation_history),
+        }
+
+        # Add tools if available
+        if tools:
+            api_params["tools"] = self._prepare_tools(tools)
+            api_params["tool_choice"] = {"type": "auto"}
+
+        return api_params
 
     def generate_response(
         self,
@@ -58,44 +414,251 @@ Provide only the direct answer to what was asked.
         Args:
             query: The user's question or request
             conversation_history: Previous messages for context
-            tools: Available tools the AI can use
+            tools: Available tools the AI can use (defaults to the
+                constructor's tool_manager definitions)
             tool_manager: Manager to execute tools
             _round: Internal parameter for tracking tool call rounds (max 2)
 
         Returns:
             Generated response as string
         """
+        tools, tool_manager = self._resolve_tools(tools, tool_manager)
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
+        # Identical questions in the same context skip the Claude round trip
+        cache_key = self._response_cache_key(query, conversation_history, tools)
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
 
-        # Prepare API call parameters efficiently
-        api_params = {
-            **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content,
-        }
-
-        # Add tools if available
-        if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
+        api_params = self._build_api_params(query, conversation_history, tools)
 
         # Get response from Claude
         response = self.client.messages.create(**api_params)
 
-        # Handle tool execution if needed
+        # Handle tool execution if needed (not cached, results depend on retrieval)
         if response.stop_reason == "tool_use" and tool_manager:
+            # Common shape: one search call in the first round
+            if (
+                _round == 0
+                and self.MAX_TOOL_ROUNDS > 1
+                and len(response.content) == 1
+                and response.content[0].type == "tool_use"
+            ):
+                return self._handle_single_tool_single_round(
+                    response, api_params, tool_manager
+                )
             return self._handle_tool_execution(
                 response, api_params, tool_manager, _round
             )
 
-        # Return direct response
-        return response.content[0].text
+        # Return direct response; answers cut short (e.g. max_tokens) aren't cached
+        response_text = response.content[0].text
+        if response.stop_reason == "end_turn":
+            self._cache_response(cache_key, response_text)
+        return response_text
+
+    def generate_response_stream(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Streaming variant of generate_response that yields text as it arrives.
+
+        A direct answer is streamed token by token as ("text", chunk) pairs.
+        When Claude asks for a tool instead, whatever text it wrote before the
+        call (e.g. "Let me search...") has already been streamed, so it is
+        re-labelled with one ("preamble", text) pair; the tool rounds then run
+        as usual and their final answer follows as a single ("text", answer).
+        Only text after the last preamble belongs to the answer.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use (defaults to the
+                constructor's tool_manager definitions)
+            tool_manager: Manager to execute tools
+
+        Yields:
+            (kind, text) pairs, kind being "text" or "preamble"
+        """
+        tools, tool_manager = self._resolve_tools(tools, tool_manager)
+        cache_key = self._response_cache_key(query, conversation_history, tools)
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            yield "text", cached_response
+            return
+
+        api_params = self._build_api_params(query, conversation_history, tools)
+
+        chunks = []
+        with self.client.messages.stream(**api_params) as stream:
+            for text in stream.text_stream:
+                chunks.append(text)
+                yield "text", text
+            response = stream.get_final_message()
+
+        if response.stop_reason == "tool_use" and tool_manager:
+            if chunks:
+                yield "preamble", "".join(chunks)
+            yield (
+                "text",
+                self._handle_tool_execution(response, api_params, tool_manager),
+            )
+            return
+
+        if response.stop_reason == "end_turn":
+            self._cache_response(cache_key, "".join(chunks))
+
+    def generate_responses_batch(
+        self, queries: List[str], timeout: Optional[float] = None
+    ) -> List[Optional[str]]:
+        """
+        Answer many standalone queries through the Message Batches API.
+
+        Meant for offline work such as evaluation runs or regenerating course
+        summaries: batches cost half as much but may take minutes to finish.
+        Queries are sent without history or tools, in jobs of up to
+        MAX_BATCH_REQUESTS, and the call blocks until every job has ended.
+
+        Args:
+            queries: Questions to answer
+            timeout: Seconds to wait for all jobs, BATCH_TIMEOUT by default
+
+        Returns:
+            Answers in the same order as queries, None where a request failed
+
+        Raises:
+            TimeoutError: If a job is still running at the deadline; that job
+                is cancelled first
+        """
+        answers: List[Optional[str]] = [None] * len(queries)
+        system = self._build_system()
+        if timeout is None:
+            timeout = self.BATCH_TIMEOUT
+        deadline = time.monotonic() + timeout
+
+        for start in range(0, len(queries), self.MAX_BATCH_REQUESTS):
+            chunk = queries[start : start + self.MAX_BATCH_REQUESTS]
+            batch = self.client.messages.batches.create(
+                requests=[
+                    {
+                        "custom_id": f"q{start + i}",
+                        "params": {
+                            **self.base_params,
+                            "messages": [{"role": "user", "content": query}],
+                            "system": system,
+                        },
+                    }
+                    for i, query in enumerate(chunk)
+                ]
+            )
+
+            while batch.processing_status != "ended":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.client.messages.batches.cancel(batch.id)
+                    raise TimeoutError(
+                        f"Batch {batch.id} did not finish within {timeout} seconds"
+                    )
+                time.sleep(min(self.BATCH_POLL_INTERVAL, remaining))
+                batch = self.client.messages.batches.retrieve(batch.id)
+
+            for entry in self.client.messages.batches.results(batch.id):
+                if entry.result.type == "succeeded":
+                    message = entry.result.message
+                    answers[int(entry.custom_id[1:])] = message.content[0].text
+
+        return answers
+
+    @staticmethod
+    def _tool_use_blocks(content: List) -> List:
+        """
+        Pick the tool_use blocks out of a response in a single pass.
+
+        Text blocks Claude writes alongside its tool calls are not lost: the
+        whole content is replayed as the assistant turn before the results.
+        """
+        return [block for block in content if block.type == "tool_use"]
+
+    def _execute_tools(self, content: List, tool_manager) -> List[Dict[str, Any]]:
+        """
+        Execute every tool_use block in a response and build tool_result blocks.
+
+        Several tool calls are independent searches, so they run in parallel on
+        the shared executor; a single call runs inline to skip executor overhead.
+        Results keep the order of their tool_use blocks.
+        """
+        tool_blocks = self._tool_use_blocks(content)
+
+        if len(tool_blocks) <= 1:
+            outputs = [
+                tool_manager.execute_tool(block.name, **block.input)
+                for block in tool_blocks
+            ]
+        else:
+            executor = _tool_executor()
+            futures = [
+                executor.submit(tool_manager.execute_tool, block.name, **block.input)
+                for block in tool_blocks
+            ]
+            errors = [future.exception() for future in futures if future.exception()]
+            if errors:
+                raise errors[0]
+            outputs = [future.result() for future in futures]
+
+        return [
+            {"type": "tool_result", "tool_use_id": block.id, "content": output}
+            for block, output in zip(tool_blocks, outputs)
+        ]
+
+    def _handle_single_tool_single_round(
+        self, initial_response, base_params: Dict[str, Any], tool_manager
+    ) -> str:
+        """
+        Fast path for a first-round response holding a single tool call.
+
+        Runs the tool inline and builds the follow-up request directly. Tools
+        stay available, so if Claude asks for a second search the general
+        loop takes over for the remaining round.
+
+        Args:
+            initial_response: The response containing one tool use request
+            base_params: Parameters of the initial call
+            tool_manager: Manager to execute tools
+
+        Returns:
+            Final response text after tool execution
+        """
+        block = initial_response.content[0]
+        output = tool_manager.execute_tool(block.name, **block.input)
+
+        messages = [
+            *base_params["messages"],
+            {"role": "assistant", "content": initial_response.content},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "tool_result", "tool_use_id": block.id, "content": output}
+                ],
+            },
+        ]
+        response = self.client.messages.create(
+            **{
+                **base_params,
+                "model": self.synthesis_model,
+                "messages": self._with_cache_breakpoint(messages),
+            }
+        )
+
+        if response.stop_reason != "tool_use":
+            return response.content[0].text
+
+        return self._handle_tool_execution(
+            response, {**base_params, "messages": messages}, tool_manager, 1
+        )
 
     def _handle_tool_execution(
         self,
@@ -106,93 +669,164 @@ Provide only the direct answer to what was asked.
     ):
         """
         Handle execution of tool calls and get follow-up response.
-        Supports up to 2 sequential rounds of tool calling.
+        Supports up to MAX_TOOL_ROUNDS sequential rounds of tool calling.
 
         Args:
             initial_response: The response containing tool use requests
             base_params: Base API parameters
             tool_manager: Manager to execute tools
-            current_round: Current round number (0 or 1)
+            current_round: Round to start from (0 or 1)
 
         Returns:
             Final response text after tool execution
         """
-        # Start with existing messages
+        # Single message buffer and parameter dict shared by every round
         messages = base_params["messages"].copy()
+        params = dict(base_params)
+        # Calls that see tool results produce the answer, so use the main model
+        params["model"] = self.synthesis_model
+        response = initial_response
+
+        while True:
+            # Add AI's tool use response
+            messages.append({"role": "assistant", "content": response.content})
+
+            # Execute all tool calls and collect results
+            try:
+                tool_results = self._execute_tools(response.content, tool_manager)
+            except Exception as e:
+                # Handle tool execution errors gracefully
+                if current_round == 0:
+                    # First round: re-raise the exception
+                    raise e
+                # Later rounds: return friendly error message
+                return self.TOOL_ERROR_MESSAGE
+
+            # Add tool results as single message
+            if tool_results:
+                messages.append({"role": "user", "content": tool_results})
+
+            params["messages"] = self._with_cache_breakpoint(messages)
+
+            if current_round >= self.MAX_TOOL_ROUNDS - 1:
+                # Maximum rounds reached, make final call without tools
+                params.pop("tools", None)
+                params.pop("tool_choice", None)
+                final_response = self.client.messages.create(**params)
+                return final_response.content[0].text
+
+            # Tools stay in params for a potential further round
+            response = self.client.messages.create(**params)
+
+            # Claude doesn't want to use tools again, return response
+            if response.stop_reason != "tool_use":
+                return response.content[0].text
+
+            current_round += 1
+
+    async def agenerate_response(
+        self,
+        query: str,
+        conversation_history: Optional[str] = None,
+        tools: Optional[List] = None,
+        tool_manager=None,
+    ) -> str:
+        """
+        Async variant of generate_response using the AsyncAnthropic client.
+
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use (defaults to the
+                constructor's tool_manager definitions)
+            tool_manager: Manager to execute tools
 
-        # Add AI's tool use response
-        messages.append({"role": "assistant", "content": initial_response.content})
+        Returns:
+            Generated response as string
+        """
+        tools, tool_manager = self._resolve_tools(tools, tool_manager)
+        cache_key = self._response_cache_key(query, conversation_history, tools)
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
 
-        # Execute all tool calls and collect results
-        tool_results = []
-        try:
-            for content_block in initial_response.content:
-                if content_block.type == "tool_use":
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name, **content_block.input
-                    )
+        api_params = self._build_api_params(query, conversation_history, tools)
 
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result,
-                        }
-                    )
-        except Exception as e:
-            # Handle tool execution errors gracefully
-            if current_round == 0:
-                # First round: re-raise the exception
-                raise e
-            else:
-                # Second round: return friendly error message
-                return "I encountered an issue while searching for additional information. Please try rephrasing your question."
-
-        # Add tool results as single message
-        if tool_results:
-            messages.append({"role": "user", "content": tool_results})
-
-        # Check if we can make another round (max 2 rounds total)
-        if current_round < 1:
-            # Prepare API call with tools still available for potential second round
-            next_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": base_params["system"],
-                "tools": base_params.get("tools"),
-                "tool_choice": base_params.get("tool_choice"),
-            }
+        response = await self.aclient.messages.create(**api_params)
+
+        if response.stop_reason == "tool_use" and tool_manager:
+            return await self._handle_tool_execution_async(
+                response, api_params, tool_manager
+            )
+
+        response_text = response.content[0].text
+        if response.stop_reason == "end_turn":
+            self._cache_response(cache_key, response_text)
+        return response_text
 
-            # Get response from Claude (might use tools again)
-            next_response = self.client.messages.create(**next_params)
-
-            # If Claude wants to use tools again, handle recursively
-            if next_response.stop_reason == "tool_use":
-                # Create new base_params for the recursive call
-                recursive_base_params = {
-                    **self.base_params,
-                    "messages": messages,
-                    "system": base_params["system"],
-                    "tools": base_params.get("tools"),
-                    "tool_choice": base_params.get("tool_choice"),
-                }
-
-                return self._handle_tool_execution(
-                    next_response,
-                    recursive_base_params,
-                    tool_manager,
-                    current_round + 1,
+    async def _handle_tool_execution_async(
+        self,
+        initial_response,
+        base_params: Dict[str, Any],
+        tool_manager,
+        current_round: int = 0,
+    ):
+        """
+        Async variant of _handle_tool_execution.
+
+        Tool calls from one response run concurrently in worker threads, since
+        tool managers are synchronous.
+
+        Args:
+            initial_response: The response containing tool use requests
+            base_params: Base API parameters
+            tool_manager: Manager to execute tools
+            current_round: Round to start from (0 or 1)
+
+        Returns:
+            Final response text after tool execution
+        """
+        messages = base_params["messages"].copy()
+        params = dict(base_params)
+        params["model"] = self.synthesis_model
+        response = initial_response
+
+        while True:
+            messages.append({"role": "assistant", "content": response.content})
+
+            tool_blocks = self._tool_use_blocks(response.content)
+            try:
+                tool_outputs = await asyncio.gather(
+                    *(
+                        asyncio.to_thread(
+                            tool_manager.execute_tool, block.name, **block.input
+                        )
+                        for block in tool_blocks
+                    )
                 )
-            else:
-                # Claude doesn't want to use tools again, return response
-                return next_response.content[0].text
-        else:
-            # Maximum rounds reached, make final call without tools
-            final_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": base_params["system"],
-            }
+            except Exception:
+                if current_round == 0:
+                    raise
+                return self.TOOL_ERROR_MESSAGE
+
+            tool_results = [
+                {"type": "tool_result", "tool_use_id": block.id, "content": output}
+                for block, output in zip(tool_blocks, tool_outputs)
+            ]
+            if tool_results:
+                messages.append({"role": "user", "content": tool_results})
+
+            params["messages"] = self._with_cache_breakpoint(messages)
+
+            if current_round >= self.MAX_TOOL_ROUNDS - 1:
+                params.pop("tools", None)
+                params.pop("tool_choice", None)
+                final_response = await self.aclient.messages.create(**params)
+                return final_response.content[0].text
+
+            response = await self.aclient.messages.create(**params)
+
+            if response.stop_reason != "tool_use":
+                return response.content[0].text
 
-            final_response = self.client.messages.create(**final_params)
-            return final_response.content[0].text
+            current_round += 1
@@ -2,19 +2,44 @@ import warnings
 
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
+import json
 import os
+from contextlib import asynccontextmanager
 from typing import List, Optional
 
+from ai_generator import aclose_http_clients
 from config import config
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from rag_system import RAGSystem
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load initial documents on startup and release HTTP pools on shutdown"""
+    docs_path = "../docs"
+    if os.path.exists(docs_path):
+        print("Loading initial documents...")
+        try:
+            courses, chunks = rag_system.add_course_folder(
+                docs_path, clear_existing=False
+            )
+            print(f"Loaded {courses} courses with {chunks} chunks")
+        except Exception as e:
+            print(f"Error loading documents: {e}")
+
+    yield
+
+    # Release the Anthropic HTTP connection pools
+    await aclose_http_clients()
+
+
 # Initialize FastAPI app
-app = FastAPI(title="Course Materials RAG System", root_path="")
+app = FastAPI(title="Course Materials RAG System", root_path="", lifespan=lifespan)
 
 # Add trusted host middleware for proxy
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
@@ -59,8 +84,10 @@ class CourseStats(BaseModel):
 # API Endpoints
 
 
+# rag_system.query blocks on Claude and ChromaDB, so this is a plain def and
+# FastAPI runs it in its threadpool instead of on the event loop
 @app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+def query_documents(request: QueryRequest):
     """Process a query and return response with sources"""
     try:
         # Create session if not provided
@@ -76,6 +103,26 @@ async def query_documents(request: QueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/query/stream")
+def query_documents_stream(request: QueryRequest):
+    """Process a query and stream the answer as server-sent events"""
+    session_id = request.session_id
+    if not session_id:
+        session_id = rag_system.session_manager.create_session()
+
+    def event_stream():
+        try:
+            for event in rag_system.query_stream(request.query, session_id):
+                if event["type"] == "sources":
+                    event["session_id"] = session_id
+                yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-stream
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @app.get("/api/courses", response_model=CourseStats)
 async def get_course_stats():
     """Get course analytics and statistics"""
@@ -89,21 +136,6 @@ async def get_course_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Load initial documents on startup"""
-    docs_path = "../docs"
-    if os.path.exists(docs_path):
-        print("Loading initial documents...")
-        try:
-            courses, chunks = rag_system.add_course_folder(
-                docs_path, clear_existing=False
-            )
-            print(f"Loaded {courses} courses with {chunks} chunks")
-        except Exception as e:
-            print(f"Error loading documents: {e}")
-
-
 import os
 from pathlib import Path
 
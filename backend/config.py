@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Optional
 
 from dotenv import load_dotenv
 
@@ -14,6 +15,12 @@ class Config:
     # Anthropic API settings
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
     ANTHROPIC_MODEL: str = "claude-sonnet-4-20250514"
+    # Optional cheaper model for the first call, which mostly decides whether
+    # to search. Off by default: when it answers directly, that answer is what
+    # the user gets, so set it only if its answer quality is acceptable
+    ANTHROPIC_ROUTING_MODEL: Optional[str] = (
+        os.getenv("ANTHROPIC_ROUTING_MODEL") or None
+    )
 
     # Embedding model settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
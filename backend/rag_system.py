@@ -1,5 +1,5 @@
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from ai_generator import AIGenerator
 from document_processor import DocumentProcessor
@@ -22,9 +22,6 @@ class RAGSystem:
         self.vector_store = VectorStore(
             config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS
         )
-        self.ai_generator = AIGenerator(
-            config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL
-        )
         self.session_manager = SessionManager(config.MAX_HISTORY)
 
         # Initialize search tools
@@ -32,6 +29,14 @@ class RAGSystem:
         self.search_tool = CourseSearchTool(self.vector_store)
         self.tool_manager.register_tool(self.search_tool)
 
+        # The generator uses the search tools by default on every query
+        self.ai_generator = AIGenerator(
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            routing_model=config.ANTHROPIC_ROUTING_MODEL,
+            tool_manager=self.tool_manager,
+        )
+
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
         Add a single course document to the knowledge base.
@@ -138,12 +143,9 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
-        # Generate response using AI with tools
+        # Generate response using AI with the generator's default tools
         response = self.ai_generator.generate_response(
-            query=prompt,
-            conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager,
+            query=prompt, conversation_history=history
         )
 
         # Get sources from the search tool
@@ -159,6 +161,47 @@ class RAGSystem:
         # Return response with sources from tool searches
         return response, sources
 
+    def query_stream(
+        self, query: str, session_id: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of query.
+
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+
+        Yields:
+            {"type": "text", "text": ...} events while the answer is generated,
+            then one {"type": "sources", "sources": [...]} event. If Claude
+            searched after writing some text, a {"type": "preamble", "text": ...}
+            event marks the text streamed so far as commentary rather than part
+            of the answer; only the text after it is saved to the session.
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+
+        history = None
+        if session_id:
+            history = self.session_manager.get_conversation_history(session_id)
+
+        chunks = []
+        for kind, text in self.ai_generator.generate_response_stream(
+            query=prompt, conversation_history=history
+        ):
+            if kind == "preamble":
+                chunks.clear()
+            else:
+                chunks.append(text)
+            yield {"type": kind, "text": text}
+
+        sources = self.tool_manager.get_last_sources()
+        self.tool_manager.reset_sources()
+
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, "".join(chunks))
+
+        yield {"type": "sources", "sources": sources}
+
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
         return {
@@ -1,5 +1,6 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional, Protocol
+from typing import Any, Dict, List, Optional, Protocol, Tuple
 
 from vector_store import SearchResults, VectorStore
 
@@ -67,38 +68,49 @@ class CourseSearchTool(Tool):
         Returns:
             Formatted search results or error message
         """
+        result, self.last_sources = self.search(query, course_name, lesson_number)
+        return result
 
+    def search(
+        self,
+        query: str,
+        course_name: Optional[str] = None,
+        lesson_number: Optional[int] = None,
+    ) -> Tuple[str, List[str]]:
+        """
+        Run a search and return its sources alongside the formatted result.
+
+        Unlike execute(), this does not touch last_sources, so concurrent
+        searches on the same tool cannot overwrite each other's sources.
+
+        Returns:
+            Tuple of (formatted results or error message, sources for the UI)
+        """
         try:
             # Use the vector store's unified search interface
             results = self.store.search(
                 query=query, course_name=course_name, lesson_number=lesson_number
             )
         except Exception as e:
-            # Clear sources on error
-            self.last_sources = []
-            return f"Search error: {str(e)}"
+            return f"Search error: {str(e)}", []
 
         # Handle errors
         if results.error:
-            # Clear sources on error
-            self.last_sources = []
-            return results.error
+            return results.error, []
 
         # Handle empty results
         if results.is_empty():
-            # Clear sources for empty results
-            self.last_sources = []
             filter_info = ""
             if course_name:
                 filter_info += f" in course '{course_name}'"
             if lesson_number:
                 filter_info += f" in lesson {lesson_number}"
-            return f"No relevant content found{filter_info}."
+            return f"No relevant content found{filter_info}.", []
 
         # Format and return results
         return self._format_results(results)
 
-    def _format_results(self, results: SearchResults) -> str:
+    def _format_results(self, results: SearchResults) -> Tuple[str, List[str]]:
         """Format search results with course and lesson context"""
         formatted = []
         sources = []  # Track sources for the UI
@@ -121,10 +133,7 @@ class CourseSearchTool(Tool):
 
             formatted.append(f"{header}\n{doc}")
 
-        # Store sources for retrieval
-        self.last_sources = sources
-
-        return "\n\n".join(formatted)
+        return "\n\n".join(formatted), sources
 
 
 class ToolManager:
@@ -132,6 +141,10 @@ class ToolManager:
 
     def __init__(self):
         self.tools = {}
+        # Sources gathered from every search since the last reset; tool calls
+        # from one response may run in parallel, so appends take the lock
+        self._sources: List[str] = []
+        self._sources_lock = threading.Lock()
 
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -150,18 +163,27 @@ class ToolManager:
         if tool_name not in self.tools:
             return f"Tool '{tool_name}' not found"
 
-        return self.tools[tool_name].execute(**kwargs)
+        tool = self.tools[tool_name]
+        if not isinstance(tool, CourseSearchTool):
+            return tool.execute(**kwargs)
+
+        # Take this call's sources directly rather than reading last_sources,
+        # which a parallel search may already have replaced
+        result, sources = tool.search(**kwargs)
+        tool.last_sources = sources
+        with self._sources_lock:
+            self._sources.extend(sources)
+        return result
 
     def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, "last_sources") and tool.last_sources:
-                return tool.last_sources
-        return []
+        """Get sources from every search since the last reset"""
+        with self._sources_lock:
+            return list(self._sources)
 
     def reset_sources(self):
         """Reset sources from all tools that track sources"""
+        with self._sources_lock:
+            self._sources = []
         for tool in self.tools.values():
             if hasattr(tool, "last_sources"):
                 tool.last_sources = []
@@ -4,25 +4,27 @@ Test configuration and fixtures for RAG Chatbot test suite.
 This module provides shared fixtures and test data for all tests.
 """
 
+import asyncio
 import os
 import shutil
-
-# FastAPI testing imports
-from fastapi.testclient import TestClient
-from fastapi import FastAPI
-import httpx
-
-# Import the modules we're testing
 import sys
 import tempfile
+from types import SimpleNamespace
 from typing import Any, Dict, List
 from unittest.mock import AsyncMock, Mock, patch
 
+import httpx
 import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
 
 sys.path.append("..")  # Add parent directory to path
 
+# Import the modules we're testing
+import ai_generator
+import anthropic
 from ai_generator import AIGenerator
+from anthropic.resources import Messages
 from config import Config
 from models import Course, CourseChunk, Lesson
 from rag_system import RAGSystem
@@ -30,7 +32,30 @@ from search_tools import CourseSearchTool, ToolManager
 from vector_store import SearchResults, VectorStore
 
 
-@pytest.fixture
+def pytest_addoption(parser):
+    parser.addoption(
+        "--runslow", action="store_true", default=False, help="run slow tests"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip slow tests unless --runslow is given and integration tests unless
+    they are selected with -m"""
+    skips = {}
+    if not config.getoption("--runslow"):
+        skips["slow"] = pytest.mark.skip(reason="needs --runslow")
+    if "integration" not in config.getoption("markexpr"):
+        skips["integration"] = pytest.mark.skip(reason="needs -m integration")
+    if not skips:
+        return
+    for item in items:
+        for keyword, skip in skips.items():
+            if keyword in item.keywords:
+                item.add_marker(skip)
+
+
+# Config and course fixtures are shared by the whole session; tests must not mutate them
+@pytest.fixture(scope="session")
 def mock_config():
     """Provide a test configuration with safe test values"""
     config = Config()
@@ -45,7 +70,7 @@ def mock_config():
     return config
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_lesson_1():
     """Create a sample lesson for testing"""
     return Lesson(
@@ -55,7 +80,7 @@ def sample_lesson_1():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_lesson_2():
     """Create another sample lesson for testing"""
     return Lesson(
@@ -65,7 +90,7 @@ def sample_lesson_2():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_course(sample_lesson_1, sample_lesson_2):
     """Create a sample course with lessons for testing"""
     return Course(
@@ -76,7 +101,7 @@ def sample_course(sample_lesson_1, sample_lesson_2):
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_course_chunks(sample_course):
     """Create sample course chunks for testing"""
     return [
@@ -163,29 +188,95 @@ def mock_vector_store(mock_search_results):
     return mock_store
 
 
+# The specced client below is the only spec'd Anthropic mock in the suite and is
+# built once per session; tests reuse it and reset it between uses. Don't add
+# per-test spec=/autospec Anthropic mocks, spec resolution dominates setup cost.
+
+
+@pytest.fixture(scope="session", autouse=True)
+def anthropic_patcher(session_mocker):
+    """Patch the Anthropic client class once for the whole session"""
+    client = Mock(spec=anthropic.Anthropic)
+    client.messages = Mock(spec=Messages)
+    return session_mocker.patch("ai_generator.anthropic.Anthropic", return_value=client)
+
+
 @pytest.fixture
-def mock_anthropic_client():
-    """Create a mock Anthropic client for testing"""
-    mock_client = Mock()
+def anthropic_class(anthropic_patcher):
+    """Return the patched Anthropic class with its call history cleared"""
+    anthropic_patcher.reset_mock()
+    return anthropic_patcher
+
 
-    # Mock response for direct text response
-    mock_text_response = Mock()
-    mock_text_response.stop_reason = "end_turn"
-    mock_text_response.content = [Mock(text="This is a test response from Claude.")]
+@pytest.fixture(scope="session")
+def shared_generator(anthropic_patcher):
+    """Create one AIGenerator wired to the patched Anthropic client"""
+    return AIGenerator("test-key", "test-model")
 
-    # Mock response for tool use
-    mock_tool_response = Mock()
-    mock_tool_response.stop_reason = "tool_use"
-    mock_tool_content = Mock()
-    mock_tool_content.type = "tool_use"
-    mock_tool_content.name = "search_course_content"
-    mock_tool_content.id = "tool_call_123"
-    mock_tool_content.input = {"query": "test query"}
-    mock_tool_response.content = [mock_tool_content]
 
-    # Configure the mock to return different responses
-    mock_client.messages.create.return_value = mock_text_response
+@pytest.fixture
+def mock_anthropic_client_blank(shared_generator):
+    """Reset the shared generator, leaving its client calls unconfigured"""
+    shared_generator._response_cache.clear()
+    shared_generator._cached_tools = None
+    shared_generator.client.reset_mock(return_value=True, side_effect=True)
+    return shared_generator.client
+
+
+# Response and tool templates are never mutated by tests, so they are built
+# once per session and shared across modules
+
+
+@pytest.fixture(scope="session")
+def mock_anthropic_response_text():
+    """Create a mock Anthropic response for text generation"""
+    return SimpleNamespace(
+        stop_reason="end_turn",
+        content=[
+            SimpleNamespace(type="text", text="This is a test response from Claude.")
+        ],
+    )
+
+
+@pytest.fixture(scope="session")
+def mock_anthropic_response_tool_use():
+    """Create a mock Anthropic response for tool use"""
+    return SimpleNamespace(
+        stop_reason="tool_use",
+        content=[
+            SimpleNamespace(
+                type="tool_use",
+                name="search_course_content",
+                id="tool_call_123",
+                input={"query": "test query", "course_name": "Python"},
+            )
+        ],
+    )
+
 
+@pytest.fixture(scope="session")
+def sample_tools():
+    """Sample tool definitions, as a tuple so tests cannot mutate them"""
+    return (
+        {
+            "name": "search_course_content",
+            "description": "Search course materials",
+            "input_schema": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Search query"}
+                },
+                "required": ["query"],
+            },
+        },
+    )
+
+
+@pytest.fixture
+def mock_anthropic_client(mock_anthropic_response_text):
+    """Create a mock Anthropic client for testing"""
+    mock_client = Mock()
+    mock_client.messages.create.return_value = mock_anthropic_response_text
     return mock_client
 
 
@@ -240,6 +331,9 @@ def sample_query_responses():
 def cleanup_test_files():
     """Auto-cleanup fixture to remove test files after each test"""
     yield
+    # Drop cached Anthropic clients so patched mocks don't leak across tests,
+    # and close the real HTTP pools generators opened for them
+    asyncio.run(ai_generator.aclose_http_clients())
     # Clean up any test files
     test_files = ["test_chroma_db", "test_data.json", "test_logs.txt"]
     for file_path in test_files:
@@ -261,7 +355,7 @@ def malformed_search_results():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def large_search_results():
     """Create large search results to test pagination/limits"""
     documents = [f"Document {i} content" for i in range(100)]
@@ -275,7 +369,7 @@ def large_search_results():
 
 
 # Performance testing fixtures
-@pytest.fixture
+@pytest.fixture(scope="session")
 def performance_test_data():
     """Create data for performance testing"""
     courses = []
@@ -307,23 +401,36 @@ def performance_test_data():
                     chunk_index=chunk_idx + (lesson_num - 1) * 5,
                 )
                 chunks.append(chunk)
-    
+
     return {"courses": courses, "chunks": chunks}
 
 
 # API Testing Fixtures
 
-@pytest.fixture
+
+def configure_mock_rag(mock_rag):
+    """Reset the test app's mock RAG system to its default answers"""
+    mock_rag.reset_mock(return_value=True, side_effect=True)
+    mock_rag.query.return_value = ("Test answer", ["Test source"])
+    mock_rag.session_manager.create_session.return_value = "test-session-123"
+    mock_rag.get_course_analytics.return_value = {
+        "total_courses": 2,
+        "course_titles": ["Python Programming", "Data Science"],
+    }
+
+
+@pytest.fixture(scope="session")
 def test_app():
     """Create a test FastAPI app without static file mounting"""
+    from typing import List, Optional
+
     from fastapi import FastAPI, HTTPException
     from fastapi.middleware.cors import CORSMiddleware
     from pydantic import BaseModel
-    from typing import List, Optional
-    
+
     # Create test app with same structure as main app but without static files
     app = FastAPI(title="Course Materials RAG System - Test", root_path="")
-    
+
     # Add CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -332,7 +439,7 @@ def test_app():
         allow_methods=["*"],
         allow_headers=["*"],
     )
-    
+
     # Define same Pydantic models
     class QueryRequest(BaseModel):
         query: str
@@ -346,27 +453,18 @@ def test_app():
     class CourseStats(BaseModel):
         total_courses: int
         course_titles: List[str]
-    
+
     # Mock RAG system for testing
     mock_rag = Mock()
-    mock_rag.query.return_value = ("Test answer", ["Test source"])
-    mock_rag.session_manager.create_session.return_value = "test-session-123"
-    mock_rag.get_course_analytics.return_value = {
-        "total_courses": 2,
-        "course_titles": ["Python Programming", "Data Science"]
-    }
-    
+    configure_mock_rag(mock_rag)
+
     # Define API endpoints with mocked dependencies
     @app.post("/api/query", response_model=QueryResponse)
     async def query_documents(request: QueryRequest):
         try:
             session_id = request.session_id or mock_rag.session_manager.create_session()
             answer, sources = mock_rag.query(request.query, session_id)
-            return QueryResponse(
-                answer=answer,
-                sources=sources,
-                session_id=session_id
-            )
+            return QueryResponse(answer=answer, sources=sources, session_id=session_id)
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -376,72 +474,92 @@ def test_app():
             analytics = mock_rag.get_course_analytics()
             return CourseStats(
                 total_courses=analytics["total_courses"],
-                course_titles=analytics["course_titles"]
+                course_titles=analytics["course_titles"],
             )
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
-    
+
     # Store mock for test access
     app.state.mock_rag = mock_rag
-    
+
     return app
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def test_client(test_app):
-    """Create a test client for the FastAPI app"""
-    return TestClient(test_app)
+    """Create a test client for the FastAPI app, shared across the session
+
+    Entering the client runs the app's startup/shutdown events, so keep this
+    session-scoped; per-test isolation comes from reset_mock_rag instead.
+    """
+    with TestClient(test_app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def reset_mock_rag(request):
+    """Give every API test a freshly configured mock RAG system
+
+    The mock is reset again on teardown so errors injected by a failing
+    test never leak into whichever test a worker runs next.
+    """
+    if "test_app" not in request.fixturenames:
+        yield
+        return
+    mock_rag = request.getfixturevalue("test_app").state.mock_rag
+    configure_mock_rag(mock_rag)
+    yield
+    configure_mock_rag(mock_rag)
+
+
+@pytest.fixture(scope="session")
+def asgi_transport(test_app):
+    """ASGI transport over the test app, shared by every async client"""
+    return httpx.ASGITransport(app=test_app)
 
 
 @pytest.fixture
-async def async_test_client(test_app):
+async def async_test_client(asgi_transport):
     """Create an async test client for the FastAPI app"""
-    async with httpx.AsyncClient(app=test_app, base_url="http://test") as client:
+    async with httpx.AsyncClient(
+        transport=asgi_transport, base_url="http://test"
+    ) as client:
         yield client
 
 
-@pytest.fixture
+# Request/response payloads are read-only, so each is built once per session
+@pytest.fixture(scope="session")
 def sample_query_request():
     """Sample query request data for API testing"""
-    return {
-        "query": "What is Python programming?",
-        "session_id": "test-session-123"
-    }
+    return {"query": "What is Python programming?", "session_id": "test-session-123"}
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_query_request_no_session():
     """Sample query request without session ID"""
-    return {
-        "query": "Explain variables in Python"
-    }
+    return {"query": "Explain variables in Python"}
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def invalid_query_request():
     """Invalid query request for error testing"""
-    return {
-        "invalid_field": "This should fail validation"
-    }
+    return {"invalid_field": "This should fail validation"}
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def expected_query_response():
     """Expected query response structure"""
     return {
         "answer": "Test answer",
         "sources": ["Test source"],
-        "session_id": "test-session-123"
+        "session_id": "test-session-123",
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def expected_course_stats():
     """Expected course statistics response"""
-    return {
-        "total_courses": 2,
-        "course_titles": ["Python Programming", "Data Science"]
-    }
+    return {"total_courses": 2, "course_titles": ["Python Programming", "Data Science"]}
 
 
 @pytest.fixture
@@ -449,6 +567,7 @@ def mock_rag_system_error():
     """Mock RAG system that raises errors for testing error handling"""
     mock_rag = Mock()
     mock_rag.query.side_effect = Exception("Database connection failed")
-    mock_rag.get_course_analytics.side_effect = Exception("Analytics service unavailable")
+    mock_rag.get_course_analytics.side_effect = Exception(
+        "Analytics service unavailable"
+    )
     return mock_rag
->>>>>>> testing_feature
@@ -4,713 +4,1130 @@ Unit tests for AIGenerator class.
 Tests the AI response generation, tool calling mechanism, and API integration.
 """
 
-from typing import Any, Dict, List
-from unittest.mock import MagicMock, Mock, patch
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, Mock, call
 
+import ai_generator
 import pytest
 from ai_generator import AIGenerator
+from anthropic.types import ToolUseBlock
 
+# Expected request parameters, built once and shared by the parametrize tables
+_EXPECTED_BASE_PARAMS = {"model": "test-model", "temperature": 0, "max_tokens": 800}
+_SAMPLE_HISTORY = "Previous conversation context"
+_CACHED_PROMPT_BLOCK = {
+    "type": "text",
+    "text": AIGenerator.SYSTEM_PROMPT,
+    "cache_control": {"type": "ephemeral"},
+}
+_EXPECTED_SYSTEM = (_CACHED_PROMPT_BLOCK,)
+_EXPECTED_SYSTEM_WITH_HISTORY = [
+    _CACHED_PROMPT_BLOCK,
+    {"type": "text", "text": f"Previous conversation:\n{_SAMPLE_HISTORY}"},
+]
+_EXPECTED_PLAIN_SYSTEM_WITH_HISTORY = (
+    f"{AIGenerator.SYSTEM_PROMPT}\n\nPrevious conversation:\n{_SAMPLE_HISTORY}"
+)
 
-class TestAIGenerator:
-    """Test cases for AIGenerator class"""
 
-    @pytest.fixture
-    def mock_anthropic_response_text(self):
-        """Create a mock Anthropic response for text generation"""
-        mock_response = Mock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = Mock()
-        mock_content.text = "This is a test response from Claude."
-        mock_response.content = [mock_content]
-        return mock_response
+@dataclass(frozen=True, slots=True)
+class _TextBlock:
+    """Text content block of a response"""
 
-    @pytest.fixture
-    def mock_anthropic_response_tool_use(self):
-        """Create a mock Anthropic response for tool use"""
-        mock_response = Mock()
-        mock_response.stop_reason = "tool_use"
-        mock_tool_content = Mock()
-        mock_tool_content.type = "tool_use"
-        mock_tool_content.name = "search_course_content"
-        mock_tool_content.id = "tool_call_123"
-        mock_tool_content.input = {"query": "test query", "course_name": "Python"}
-        mock_response.content = [mock_tool_content]
-        return mock_response
+    text: str
+    type: str = "text"
 
-    @pytest.fixture
-    def mock_anthropic_client(self, mock_anthropic_response_text):
-        """Create a mock Anthropic client"""
-        mock_client = Mock()
-        mock_client.messages.create.return_value = mock_anthropic_response_text
-        return mock_client
 
-    @pytest.fixture
-    def mock_tool_manager(self):
-        """Create a mock tool manager"""
-        manager = Mock()
-        manager.execute_tool.return_value = "Search results from tool"
-        return manager
+def _tool_use(name, tid, **inp):
+    """Build a tool_use content block"""
+    return SimpleNamespace(type="tool_use", name=name, id=tid, input=inp)
 
-    @pytest.fixture
-    def sample_tools(self):
-        """Sample tool definitions"""
-        return [
-            {
-                "name": "search_course_content",
-                "description": "Search course materials",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string", "description": "Search query"}
-                    },
-                    "required": ["query"],
-                },
-            }
-        ]
 
-    def test_initialization(self):
-        """Test AIGenerator initialization"""
-        with patch("ai_generator.anthropic.Anthropic") as mock_anthropic:
-            generator = AIGenerator("test-api-key", "claude-test-model")
+def _tool_uses(*queries):
+    """Build one search_course_content tool_use block per query"""
+    return tuple(
+        _tool_use("search_course_content", f"tool{i}_id", query=query)
+        for i, query in enumerate(queries, 1)
+    )
 
-            assert generator.model == "claude-test-model"
-            assert generator.base_params["model"] == "claude-test-model"
-            assert generator.base_params["temperature"] == 0
-            assert generator.base_params["max_tokens"] == 800
 
-            mock_anthropic.assert_called_once_with(api_key="test-api-key")
+# Read-only tool_use blocks shared by the multi-tool tests
+_TWO_TOOLS = _tool_uses("first query", "second query")
 
-    def test_system_prompt_constant(self):
-        """Test that system prompt is properly defined"""
-        assert hasattr(AIGenerator, "SYSTEM_PROMPT")
-        assert isinstance(AIGenerator.SYSTEM_PROMPT, str)
-        assert len(AIGenerator.SYSTEM_PROMPT) > 0
-        assert "search tool" in AIGenerator.SYSTEM_PROMPT.lower()
 
-    def test_generate_response_text_only(
-        self, mock_anthropic_client, mock_anthropic_response_text
-    ):
-        """Test generating response without tools"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+def _tool_response(*blocks):
+    """Build a response asking for the given tool calls"""
+    return SimpleNamespace(stop_reason="tool_use", content=list(blocks))
 
-            response = generator.generate_response("What is Python?")
 
-            assert response == "This is a test response from Claude."
+def _text_response(text):
+    """Build a final text response"""
+    return SimpleNamespace(stop_reason="end_turn", content=[_TextBlock(text)])
 
-            # Verify API call
-            mock_anthropic_client.messages.create.assert_called_once()
-            call_args = mock_anthropic_client.messages.create.call_args[1]
 
-            assert call_args["model"] == "test-model"
-            assert call_args["temperature"] == 0
-            assert call_args["max_tokens"] == 800
-            assert call_args["messages"] == [
-                {"role": "user", "content": "What is Python?"}
-            ]
-            assert call_args["system"] == AIGenerator.SYSTEM_PROMPT
-            assert "tools" not in call_args
+class TestAIGenerator:
+    """Test cases for AIGenerator class"""
 
-    def test_generate_response_with_conversation_history(self, mock_anthropic_client):
-        """Test generating response with conversation history"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+    @pytest.fixture
+    def mock_anthropic_client(
+        self, mock_anthropic_client_blank, mock_anthropic_response_text
+    ):
+        """Reset the shared generator's client to answer with plain text"""
+        create = mock_anthropic_client_blank.messages.create
+        create.return_value = mock_anthropic_response_text
+        return mock_anthropic_client_blank
 
-            history = "Previous conversation context"
-            generator.generate_response(
-                "Follow up question", conversation_history=history
-            )
+    @pytest.fixture
+    def generator(self, shared_generator, mock_anthropic_client_blank):
+        """Return the shared AIGenerator, reset for the current test"""
+        return shared_generator
 
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-            expected_system = (
-                f"{AIGenerator.SYSTEM_PROMPT}\n\nPrevious conversation:\n{history}"
-            )
-            assert call_args["system"] == expected_system
+    @pytest.fixture
+    def mock_tool_manager(self):
+        """Create a mock tool manager"""
+        return SimpleNamespace(
+            execute_tool=Mock(return_value="Search results from tool"),
+            get_tool_definitions=Mock(return_value=[]),
+        )
 
-    def test_generate_response_with_tools_no_tool_use(
-        self, mock_anthropic_client, sample_tools, mock_tool_manager
+    def test_initialization(self, anthropic_class):
+        """Test AIGenerator initialization"""
+        generator = AIGenerator("test-api-key", "claude-test-model")
+
+        assert generator.model == "claude-test-model"
+        assert generator.base_params["model"] == "claude-test-model"
+        assert generator.base_params["temperature"] == 0
+        assert generator.base_params["max_tokens"] == 800
+
+        anthropic_class.assert_called_once_with(
+            api_key="test-api-key", http_client=ai_generator._shared_httpx_client()
+        )
+
+    def test_client_shared_per_api_key(self, monkeypatch, anthropic_class):
+        """Test that generators with the same API key share one client"""
+        monkeypatch.setattr(anthropic_class, "side_effect", lambda **kwargs: Mock())
+
+        first = AIGenerator("test-api-key", "claude-test-model")
+        second = AIGenerator("test-api-key", "claude-other-model")
+        other = AIGenerator("other-api-key", "claude-test-model")
+
+        assert first.client is second.client
+        assert other.client is not first.client
+        assert anthropic_class.call_count == 2
+
+    def test_close_keeps_shared_http_client(self, monkeypatch, anthropic_class):
+        """Test that closing one generator leaves other cached clients usable"""
+        monkeypatch.setattr(anthropic_class, "side_effect", lambda **kwargs: Mock())
+        other = AIGenerator("other-api-key", "claude-test-model")
+
+        with AIGenerator("test-api-key", "claude-test-model"):
+            http_client = ai_generator._shared_httpx_client()
+
+        assert not http_client.is_closed
+        assert "test-api-key" not in ai_generator._CLIENT_CACHE
+        assert ai_generator._CLIENT_CACHE["other-api-key"] is other.client
+
+    def test_async_client_created_lazily(self, mocker):
+        """Test that the async client is built on first use, once per API key"""
+        async_class = mocker.patch(
+            "ai_generator.anthropic.AsyncAnthropic", side_effect=lambda **kwargs: Mock()
+        )
+
+        first = AIGenerator("test-api-key", "claude-test-model")
+        second = AIGenerator("test-api-key", "claude-other-model")
+        async_class.assert_not_called()
+
+        assert first.aclient is second.aclient
+        async_class.assert_called_once_with(
+            api_key="test-api-key",
+            http_client=ai_generator._shared_async_httpx_client(),
+        )
+
+    async def test_aclose_http_clients(self):
+        """Test that shutdown closes the shared HTTP clients and clears the caches"""
+        generator = AIGenerator("test-api-key", "claude-test-model")
+        assert generator.aclient is not None
+        http_client = ai_generator._shared_httpx_client()
+        async_http_client = ai_generator._shared_async_httpx_client()
+
+        await ai_generator.aclose_http_clients()
+
+        assert http_client.is_closed
+        assert async_http_client.is_closed
+        assert not ai_generator._CLIENT_CACHE
+        assert not ai_generator._ASYNC_CLIENT_CACHE
+        assert ai_generator._shared_httpx_client() is not http_client
+
+    def test_system_prompt_constant(self):
+        """Test that system prompt is properly defined"""
+        prompt = AIGenerator.SYSTEM_PROMPT
+        assert isinstance(prompt, str)
+        assert len(prompt) > 0
+        assert "search tool" in prompt.lower()
+        assert prompt is ai_generator.SYSTEM_PROMPT
+
+    @pytest.mark.parametrize(
+        "query, conversation_history, use_tools, expected_system",
+        [
+            pytest.param(
+                "What is Python?", None, False, _EXPECTED_SYSTEM, id="text_only"
+            ),
+            pytest.param(
+                "Follow up question",
+                _SAMPLE_HISTORY,
+                False,
+                _EXPECTED_SYSTEM_WITH_HISTORY,
+                id="conversation_history",
+            ),
+            pytest.param(
+                "What is 2+2?", None, True, _EXPECTED_SYSTEM, id="tools_no_tool_use"
+            ),
+            pytest.param(
+                "Test query",
+                _SAMPLE_HISTORY,
+                True,
+                _EXPECTED_SYSTEM_WITH_HISTORY,
+                id="history_and_tools",
+            ),
+        ],
+    )
+    def test_generate_response(
+        self,
+        generator,
+        mock_anthropic_client,
+        sample_tools,
+        mock_tool_manager,
+        query,
+        conversation_history,
+        use_tools,
+        expected_system,
     ):
-        """Test response generation with tools available but not used"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            response = generator.generate_response(
-                "What is 2+2?", tools=sample_tools, tool_manager=mock_tool_manager
-            )
+        """Test the parameters of a direct (non tool-use) generate_response call"""
+        tool_kwargs = (
+            {"tools": sample_tools, "tool_manager": mock_tool_manager}
+            if use_tools
+            else {}
+        )
+
+        response = generator.generate_response(
+            query, conversation_history=conversation_history, **tool_kwargs
+        )
+
+        assert response == "This is a test response from Claude."
+
+        expected_params = {
+            **_EXPECTED_BASE_PARAMS,
+            "messages": [{"role": "user", "content": query}],
+            "system": expected_system,
+        }
+        if use_tools:
+            expected_params["tools"] = [
+                {**sample_tools[0], "cache_control": {"type": "ephemeral"}}
+            ]
+            expected_params["tool_choice"] = {"type": "auto"}
+
+        mock_anthropic_client.messages.create.assert_called_once_with(**expected_params)
+        # Tools, when offered, were not used
+        mock_tool_manager.execute_tool.assert_not_called()
 
-            assert response == "This is a test response from Claude."
+    def test_generate_response_without_prompt_caching(self, mock_anthropic_client):
+        """Test legacy models receive the system prompt as a plain string"""
+        generator = AIGenerator("test-key", "claude-2.1")
 
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-            assert call_args["tools"] == sample_tools
-            assert call_args["tool_choice"] == {"type": "auto"}
+        generator.generate_response(
+            "Follow up question", conversation_history=_SAMPLE_HISTORY
+        )
 
-            # Tool manager should not be called
-            mock_tool_manager.execute_tool.assert_not_called()
+        call_args = SimpleNamespace(
+            **mock_anthropic_client.messages.create.call_args.kwargs
+        )
+        assert generator.prompt_caching is False
+        assert call_args.system == _EXPECTED_PLAIN_SYSTEM_WITH_HISTORY
 
     def test_generate_response_with_tool_use(
         self,
-        mock_anthropic_client,
+        generator,
+        mock_anthropic_client_blank,
         mock_anthropic_response_tool_use,
         sample_tools,
         mock_tool_manager,
     ):
         """Test response generation with tool use"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+        # First call returns tool use, second call returns final response
+        final_response = _text_response("Final answer with tool results")
 
-            # First call returns tool use, second call returns final response
-            final_response = Mock()
-            final_response.content = [Mock(text="Final answer with tool results")]
+        mock_anthropic_client_blank.messages.create.side_effect = [
+            mock_anthropic_response_tool_use,
+            final_response,
+        ]
 
-            mock_anthropic_client.messages.create.side_effect = [
-                mock_anthropic_response_tool_use,
-                final_response,
-            ]
+        response = generator.generate_response(
+            "Search for Python courses",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager,
+        )
 
-            response = generator.generate_response(
-                "Search for Python courses",
-                tools=sample_tools,
-                tool_manager=mock_tool_manager,
-            )
-
-            assert response == "Final answer with tool results"
+        assert response == "Final answer with tool results"
 
-            # Verify tool was executed
-            mock_tool_manager.execute_tool.assert_called_once_with(
-                "search_course_content", query="test query", course_name="Python"
-            )
+        # Verify tool was executed
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", query="test query", course_name="Python"
+        )
 
-            # Verify two API calls were made
-            assert mock_anthropic_client.messages.create.call_count == 2
+        # Verify two API calls were made
+        assert mock_anthropic_client_blank.messages.create.call_count == 2
 
-    def test_handle_tool_execution_single_tool(
-        self, mock_anthropic_client, mock_anthropic_response_tool_use, mock_tool_manager
+    def test_single_tool_fast_path(
+        self,
+        mocker,
+        generator,
+        mock_anthropic_client_blank,
+        mock_anthropic_response_tool_use,
+        sample_tools,
+        mock_tool_manager,
     ):
-        """Test handling of single tool execution"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            base_params = {
-                "model": "test-model",
-                "messages": [{"role": "user", "content": "test query"}],
-                "system": "test system",
-            }
+        """Test a single first-round tool call skips the general tool loop"""
+        final_response = _text_response("Final answer")
+        mock_anthropic_client_blank.messages.create.side_effect = [
+            mock_anthropic_response_tool_use,
+            final_response,
+        ]
 
-            # Mock response after tool execution (no more tool use)
-            final_response = Mock()
-            final_response.content = [Mock(text="Tool response integrated")]
-            final_response.stop_reason = (
-                "end_turn"  # Important: Claude doesn't want more tools
-            )
-            mock_anthropic_client.messages.create.return_value = final_response
+        mock_loop = mocker.patch.object(generator, "_handle_tool_execution")
 
-            result = generator._handle_tool_execution(
-                mock_anthropic_response_tool_use, base_params, mock_tool_manager
-            )
+        response = generator.generate_response(
+            "Search for Python courses",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager,
+        )
 
-            assert result == "Tool response integrated"
+        assert response == "Final answer"
+        mock_loop.assert_not_called()
 
-            # Verify tool execution
-            mock_tool_manager.execute_tool.assert_called_once_with(
-                "search_course_content", query="test query", course_name="Python"
-            )
+        second_call = mock_anthropic_client_blank.messages.create.call_args[1]
+        assert second_call["tools"][0]["name"] == "search_course_content"
+        assert second_call["messages"][2]["content"] == [
+            {
+                "type": "tool_result",
+                "tool_use_id": "tool_call_123",
+                "content": "Search results from tool",
+            }
+        ]
 
-            # Verify API call structure - should have tools available for potential second round
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-            assert len(call_args["messages"]) == 3  # Original + assistant + tool result
-            assert call_args["messages"][1]["role"] == "assistant"
-            assert call_args["messages"][2]["role"] == "user"
-            # Tools should be available in case Claude wants to use them again
+    def test_routing_and_synthesis_models(
+        self,
+        mock_anthropic_client_blank,
+        mock_anthropic_response_tool_use,
+        sample_tools,
+        mock_tool_manager,
+    ):
+        """Test the routing model picks tools and the main model answers"""
+        generator = AIGenerator("test-key", "test-sonnet", routing_model="test-haiku")
+
+        final_response = _text_response("Final answer")
+        mock_anthropic_client_blank.messages.create.side_effect = [
+            mock_anthropic_response_tool_use,
+            final_response,
+        ]
 
+        response = generator.generate_response(
+            "Search for Python courses",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager,
+        )
+
+        assert response == "Final answer"
+        first_call, second_call = (
+            mock_anthropic_client_blank.messages.create.call_args_list
+        )
+        assert first_call.kwargs["model"] == "test-haiku"
+        assert second_call.kwargs["model"] == "test-sonnet"
+
+        # The routing model's tool_use is replayed unchanged to the main model
+        assert second_call.kwargs["messages"][1]["content"] == (
+            mock_anthropic_response_tool_use.content
+        )
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", query="test query", course_name="Python"
+        )
+
+    def test_handle_tool_execution_single_tool(
+        self,
+        generator,
+        mock_anthropic_client_blank,
+        mock_anthropic_response_tool_use,
+        mock_tool_manager,
+        sample_tools,
+    ):
+        """Test handling of single tool execution"""
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test query"}],
+            "system": "test system",
+            "tools": sample_tools,
+            "tool_choice": {"type": "auto"},
+        }
+
+        # Mock response after tool execution (no more tool use)
+        final_response = _text_response("Tool response integrated")
+        mock_anthropic_client_blank.messages.create.return_value = final_response
+
+        result = generator._handle_tool_execution(
+            mock_anthropic_response_tool_use, base_params, mock_tool_manager
+        )
+
+        assert result == "Tool response integrated"
+
+        # Verify tool execution
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", query="test query", course_name="Python"
+        )
+
+        # Verify API call structure - should have tools available for potential second round
+        call_args = SimpleNamespace(
+            **mock_anthropic_client_blank.messages.create.call_args.kwargs
+        )
+        assert len(call_args.messages) == 3  # Original + assistant + tool result
+        assert call_args.messages[1]["role"] == "assistant"
+        assert call_args.messages[2]["role"] == "user"
+        # Tools stay available in case Claude wants to use them again
+        assert call_args.tools is sample_tools
+        assert call_args.tool_choice == {"type": "auto"}
+
+    def test_handle_tool_execution_cache_breakpoint(
+        self, generator, mock_anthropic_client, mock_tool_manager
+    ):
+        """Test that the follow-up call caches the prefix up to the tool use turn"""
+        tool_block = ToolUseBlock(
+            type="tool_use",
+            id="tool_call_123",
+            name="search_course_content",
+            input={"query": "test query"},
+        )
+        tool_response = _tool_response(tool_block)
+
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test query"}],
+            "system": "test system",
+        }
+
+        generator._handle_tool_execution(tool_response, base_params, mock_tool_manager)
+
+        messages = mock_anthropic_client.messages.create.call_args[1]["messages"]
+        assert messages[1]["content"] == [
+            {
+                "type": "tool_use",
+                "id": "tool_call_123",
+                "name": "search_course_content",
+                "input": {"query": "test query"},
+                "cache_control": {"type": "ephemeral"},
+            }
+        ]
+        # The freshest message is left unmarked
+        assert "cache_control" not in messages[2]["content"][0]
+        # The marker is not persisted on the original response
+        assert tool_response.content == [tool_block]
+
+    @pytest.mark.parametrize(
+        "tool_blocks",
+        [
+            pytest.param(_TWO_TOOLS[:1], id="one_tool"),
+            pytest.param(_TWO_TOOLS, id="two_tools"),
+            pytest.param(
+                _tool_uses(*(f"query {i}" for i in range(5))), id="five_tools"
+            ),
+        ],
+    )
     def test_handle_tool_execution_multiple_tools(
-        self, mock_anthropic_client, mock_tool_manager
+        self, generator, mock_anthropic_client_blank, mock_tool_manager, tool_blocks
     ):
         """Test handling multiple tool executions in one response"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            # Create response with multiple tool uses
-            mock_response = Mock()
-            mock_response.stop_reason = "tool_use"
-
-            tool1 = Mock()
-            tool1.type = "tool_use"
-            tool1.name = "search_course_content"
-            tool1.id = "tool1_id"
-            tool1.input = {"query": "first query"}
-
-            tool2 = Mock()
-            tool2.type = "tool_use"
-            tool2.name = "search_course_content"
-            tool2.id = "tool2_id"
-            tool2.input = {"query": "second query"}
-
-            mock_response.content = [tool1, tool2]
-
-            base_params = {
-                "model": "test-model",
-                "messages": [{"role": "user", "content": "test"}],
-                "system": "test system",
-            }
+        mock_response = _tool_response(*tool_blocks)
+        queries = [block.input["query"] for block in tool_blocks]
+
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test"}],
+            "system": "test system",
+        }
+
+        # Configure tool manager to return a result per query
+        mock_tool_manager.execute_tool.side_effect = lambda name, query: (
+            f"Result for {query}"
+        )
+
+        # Mock final response
+        final_response = _text_response("Multiple tools handled")
+        mock_anthropic_client_blank.messages.create.return_value = final_response
+
+        result = generator._handle_tool_execution(
+            mock_response, base_params, mock_tool_manager
+        )
+
+        assert result == "Multiple tools handled"
+
+        # Tools run in parallel, so put the recorded calls back in query order
+        executed = sorted(
+            mock_tool_manager.execute_tool.call_args_list,
+            key=lambda c: queries.index(c.kwargs["query"]),
+        )
+        assert executed == [
+            call("search_course_content", query=query) for query in queries
+        ]
 
-            # Configure tool manager to return different results
-            mock_tool_manager.execute_tool.side_effect = ["Result 1", "Result 2"]
+        # Results are sent back in tool-call order
+        call_args = mock_anthropic_client_blank.messages.create.call_args[1]
+        tool_results = call_args["messages"][-1]["content"]
+        assert [r["tool_use_id"] for r in tool_results] == [
+            block.id for block in tool_blocks
+        ]
+        assert [r["content"] for r in tool_results] == [
+            f"Result for {query}" for query in queries
+        ]
 
-            # Mock final response
-            final_response = Mock()
-            final_response.content = [Mock(text="Multiple tools handled")]
-            mock_anthropic_client.messages.create.return_value = final_response
+    def test_handle_tool_execution_parallel_tool_error(
+        self, generator, mock_tool_manager
+    ):
+        """Test that a failure in one of several parallel tool calls propagates"""
+        tool1 = _tool_use("search_course_content", "tool1_id", query="ok")
+        tool2 = _tool_use("search_course_content", "tool2_id", query="boom")
+        mock_response = _tool_response(tool1, tool2)
 
-            result = generator._handle_tool_execution(
-                mock_response, base_params, mock_tool_manager
-            )
+        def execute_tool(name, query):
+            if query == "boom":
+                raise Exception("Tool execution failed")
+            return "Result"
 
-            assert result == "Multiple tools handled"
+        mock_tool_manager.execute_tool.side_effect = execute_tool
 
-            # Verify both tools were executed
-            assert mock_tool_manager.execute_tool.call_count == 2
-            mock_tool_manager.execute_tool.assert_any_call(
-                "search_course_content", query="first query"
-            )
-            mock_tool_manager.execute_tool.assert_any_call(
-                "search_course_content", query="second query"
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test"}],
+            "system": "test system",
+        }
+
+        with pytest.raises(Exception, match="Tool execution failed"):
+            generator._handle_tool_execution(
+                mock_response, base_params, mock_tool_manager
             )
 
-    def test_handle_tool_execution_no_tool_results(self, mock_anthropic_client):
+        result = generator._handle_tool_execution(
+            mock_response, base_params, mock_tool_manager, current_round=1
+        )
+        assert result == AIGenerator.TOOL_ERROR_MESSAGE
+
+    def test_handle_tool_execution_mixed_content(
+        self, generator, mock_anthropic_client, mock_tool_manager
+    ):
+        """Test text written alongside a tool call is kept in the conversation"""
+        text_block = _TextBlock("Let me look that up.")
+        tool_block = _tool_use("search_course_content", "tool_1", query="loops")
+        initial_response = _tool_response(text_block, tool_block)
+
+        base_params = {
+            "messages": [{"role": "user", "content": "Explain loops"}],
+            "system": "System prompt",
+        }
+
+        generator._handle_tool_execution(
+            initial_response, base_params, mock_tool_manager
+        )
+
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", query="loops"
+        )
+        messages = mock_anthropic_client.messages.create.call_args[1]["messages"]
+        assert messages[1]["content"] == [text_block, tool_block]
+        assert [r["tool_use_id"] for r in messages[2]["content"]] == ["tool_1"]
+
+    def test_handle_tool_execution_no_tool_results(
+        self, generator, mock_anthropic_client_blank, mock_tool_manager
+    ):
         """Test tool execution handling when no tools are found"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            # Create response with no tool use content
-            mock_response = Mock()
-            mock_response.stop_reason = "tool_use"
-            text_content = Mock()
-            text_content.type = "text"
-            mock_response.content = [text_content]
-
-            base_params = {
-                "model": "test-model",
-                "messages": [{"role": "user", "content": "test"}],
-                "system": "test system",
-            }
+        # Create response with no tool use content
+        text_content = SimpleNamespace(type="text")
+        mock_response = _tool_response(text_content)
 
-            mock_tool_manager = Mock()
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test"}],
+            "system": "test system",
+        }
 
-            # Mock final response
-            final_response = Mock()
-            final_response.content = [Mock(text="No tools executed")]
-            mock_anthropic_client.messages.create.return_value = final_response
+        # Mock final response
+        final_response = _text_response("No tools executed")
+        mock_anthropic_client_blank.messages.create.return_value = final_response
 
-            result = generator._handle_tool_execution(
-                mock_response, base_params, mock_tool_manager
-            )
-
-            assert result == "No tools executed"
+        result = generator._handle_tool_execution(
+            mock_response, base_params, mock_tool_manager
+        )
 
-            # No tools should be executed
-            mock_tool_manager.execute_tool.assert_not_called()
+        assert result == "No tools executed"
 
-    def test_api_parameter_construction(self, mock_anthropic_client, sample_tools):
-        """Test that API parameters are correctly constructed"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+        # No tools should be executed
+        mock_tool_manager.execute_tool.assert_not_called()
 
+    def test_tools_cache_breakpoint(
+        self, generator, mock_anthropic_client, sample_tools, mock_tool_manager
+    ):
+        """Test that only the last tool is marked for caching"""
+        tools = [*sample_tools, {**sample_tools[0], "name": "get_course_outline"}]
+        generator.generate_response(
+            "Test query", tools=tools, tool_manager=mock_tool_manager
+        )
+        first_tools = mock_anthropic_client.messages.create.call_args[1]["tools"]
+
+        assert "cache_control" not in first_tools[0]
+        assert first_tools[-1]["cache_control"] == {"type": "ephemeral"}
+
+        # Caller's definitions are left untouched
+        assert all("cache_control" not in tool for tool in tools)
+
+        # The marked copy is reused for the same tools list
+        generator.generate_response(
+            "Another query", tools=tools, tool_manager=mock_tool_manager
+        )
+        second_tools = mock_anthropic_client.messages.create.call_args[1]["tools"]
+        assert second_tools is first_tools
+
+    def test_response_cache_hit(self, generator, mock_anthropic_client):
+        """Test that repeated direct questions are served from the cache"""
+        first = generator.generate_response("What is Python?")
+        second = generator.generate_response("What is Python?")
+
+        assert first == second == "This is a test response from Claude."
+        assert mock_anthropic_client.messages.create.call_count == 1
+
+        # A different conversation context is a different cache entry
+        generator.generate_response("What is Python?", conversation_history="Hi")
+        assert mock_anthropic_client.messages.create.call_count == 2
+
+    def test_response_cache_skips_tool_use(
+        self,
+        generator,
+        mock_anthropic_client_blank,
+        mock_anthropic_response_tool_use,
+        sample_tools,
+        mock_tool_manager,
+    ):
+        """Test that answers built from tool results are not cached"""
+        final_response = _text_response("Answer from search")
+        mock_anthropic_client_blank.messages.create.side_effect = [
+            mock_anthropic_response_tool_use,
+            final_response,
+        ] * 2
+
+        for _ in range(2):
             generator.generate_response(
-                "Test query", conversation_history="Previous chat", tools=sample_tools
+                "Search for Python courses",
+                tools=sample_tools,
+                tool_manager=mock_tool_manager,
             )
 
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-
-            # Verify all expected parameters are present
-            assert "model" in call_args
-            assert "temperature" in call_args
-            assert "max_tokens" in call_args
-            assert "messages" in call_args
-            assert "system" in call_args
-            assert "tools" in call_args
-            assert "tool_choice" in call_args
-
-            # Verify parameter values
-            assert call_args["model"] == "test-model"
-            assert call_args["temperature"] == 0
-            assert call_args["max_tokens"] == 800
-            assert call_args["tools"] == sample_tools
-            assert call_args["tool_choice"] == {"type": "auto"}
-
-    def test_error_handling_api_exception(self, mock_anthropic_client):
-        """Test error handling when API raises exception"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+        assert mock_anthropic_client_blank.messages.create.call_count == 4
+        assert mock_tool_manager.execute_tool.call_count == 2
+
+    def test_response_cache_skips_truncated(
+        self, generator, mock_anthropic_client_blank
+    ):
+        """Test that answers cut off at max_tokens are not cached"""
+        truncated = SimpleNamespace(
+            stop_reason="max_tokens", content=[_TextBlock("Python is a")]
+        )
+        mock_anthropic_client_blank.messages.create.return_value = truncated
 
-            mock_anthropic_client.messages.create.side_effect = Exception("API Error")
+        generator.generate_response("What is Python?")
+        generator.generate_response("What is Python?")
 
-            with pytest.raises(Exception, match="API Error"):
-                generator.generate_response("Test query")
+        assert mock_anthropic_client_blank.messages.create.call_count == 2
+        assert not generator._response_cache
 
-    def test_error_handling_tool_manager_exception(
-        self, mock_anthropic_client, mock_anthropic_response_tool_use
+    def test_response_cache_key_tools_and_model(
+        self, monkeypatch, generator, sample_tools
     ):
-        """Test error handling when tool manager raises exception"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            mock_tool_manager = Mock()
-            mock_tool_manager.execute_tool.side_effect = Exception(
-                "Tool execution failed"
-            )
+        """Test that the cache key depends on the tool names and the model"""
+        other_tools = [{**sample_tools[0], "name": "get_course_outline"}]
+        key = generator._response_cache_key("What is Python?", None, sample_tools)
+
+        assert key == generator._response_cache_key(
+            "What is Python?", None, [dict(tool) for tool in sample_tools]
+        )
+        assert key != generator._response_cache_key(
+            "What is Python?", None, other_tools
+        )
+
+        monkeypatch.setattr(generator, "routing_model", "other-model")
+        assert key != generator._response_cache_key(
+            "What is Python?", None, sample_tools
+        )
+
+    def test_response_cache_eviction(
+        self, monkeypatch, generator, mock_anthropic_client
+    ):
+        """Test that the least recently used answer is evicted when full"""
+        monkeypatch.setattr(generator, "RESPONSE_CACHE_SIZE", 2, raising=False)
 
-            # Should let the exception propagate or handle gracefully
-            with pytest.raises(Exception):
-                generator._handle_tool_execution(
-                    mock_anthropic_response_tool_use,
-                    {"messages": [], "system": "test"},
-                    mock_tool_manager,
-                )
+        generator.generate_response("first")
+        generator.generate_response("second")
+        generator.generate_response("first")  # refresh "first"
+        generator.generate_response("third")  # evicts "second"
+        assert mock_anthropic_client.messages.create.call_count == 3
 
-    def test_response_content_access(self, mock_anthropic_client):
-        """Test accessing response content safely"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+        generator.generate_response("first")
+        assert mock_anthropic_client.messages.create.call_count == 3
 
-            # Test with malformed response
-            malformed_response = Mock()
-            malformed_response.stop_reason = "end_turn"
-            malformed_response.content = []  # Empty content
+        generator.generate_response("second")
+        assert mock_anthropic_client.messages.create.call_count == 4
 
-            mock_anthropic_client.messages.create.return_value = malformed_response
+    def test_response_cache_thread_safe(self, monkeypatch, generator):
+        """Test that concurrent lookups and evictions do not race"""
+        monkeypatch.setattr(generator, "RESPONSE_CACHE_SIZE", 2, raising=False)
 
-            # Should raise an IndexError for empty content
-            with pytest.raises(IndexError):
-                generator.generate_response("Test query")
+        def churn(worker):
+            for i in range(500):
+                key = f"{worker}-{i % 4}"
+                if generator._get_cached_response(key) is None:
+                    generator._cache_response(key, "answer")
 
-    def test_system_prompt_with_history_construction(self, mock_anthropic_client):
-        """Test system prompt construction with conversation history"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for future in [executor.submit(churn, n) for n in range(8)]:
+                future.result()
 
-            history = "User: Hello\nAssistant: Hi there!"
-            generator.generate_response("Follow up", conversation_history=history)
+        assert len(generator._response_cache) == 2
 
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-            system_content = call_args["system"]
-
-            assert AIGenerator.SYSTEM_PROMPT in system_content
-            assert "Previous conversation:" in system_content
-            assert history in system_content
+    def test_generate_response_stream_text_only(
+        self, generator, mock_anthropic_client_blank
+    ):
+        """Test that a direct answer is streamed chunk by chunk and cached"""
+        stream_context = MagicMock()
+        stream = stream_context.__enter__.return_value
+        mock_anthropic_client_blank.messages.stream.return_value = stream_context
+        stream.text_stream = iter(["Python is ", "a language."])
+        stream.get_final_message.return_value = SimpleNamespace(stop_reason="end_turn")
+
+        chunks = list(generator.generate_response_stream("What is Python?"))
+        assert chunks == [("text", "Python is "), ("text", "a language.")]
+
+        # The joined answer is served from the cache on repeat
+        assert list(generator.generate_response_stream("What is Python?")) == [
+            ("text", "Python is a language.")
+        ]
+        mock_anthropic_client_blank.messages.stream.assert_called_once()
 
-    def test_tool_choice_parameter(self, mock_anthropic_client, sample_tools):
-        """Test tool_choice parameter is set correctly"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+    def test_generate_response_stream_tool_use(
+        self,
+        generator,
+        mock_anthropic_client,
+        mock_anthropic_response_tool_use,
+        mock_tool_manager,
+        sample_tools,
+    ):
+        """Test that a tool_use stream falls back to tool execution"""
+        stream_context = MagicMock()
+        stream = stream_context.__enter__.return_value
+        mock_anthropic_client.messages.stream.return_value = stream_context
+        stream.text_stream = iter([])
+        stream.get_final_message.return_value = mock_anthropic_response_tool_use
+
+        chunks = list(
+            generator.generate_response_stream(
+                "Search for Python",
+                tools=sample_tools,
+                tool_manager=mock_tool_manager,
+            )
+        )
 
-            generator.generate_response("Test query", tools=sample_tools)
+        assert chunks == [("text", "This is a test response from Claude.")]
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", query="test query", course_name="Python"
+        )
+        assert not generator._response_cache
 
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-            assert call_args["tool_choice"] == {"type": "auto"}
+    def test_generate_response_stream_preamble(
+        self,
+        generator,
+        mock_anthropic_client,
+        mock_anthropic_response_tool_use,
+        mock_tool_manager,
+        sample_tools,
+    ):
+        """Test that text streamed before a tool call is re-labelled as preamble"""
+        stream_context = MagicMock()
+        stream = stream_context.__enter__.return_value
+        mock_anthropic_client.messages.stream.return_value = stream_context
+        stream.text_stream = iter(["Let me ", "search."])
+        stream.get_final_message.return_value = mock_anthropic_response_tool_use
+
+        chunks = list(
+            generator.generate_response_stream(
+                "Search for Python",
+                tools=sample_tools,
+                tool_manager=mock_tool_manager,
+            )
+        )
 
-    def test_base_params_optimization(self):
-        """Test that base parameters are pre-built for efficiency"""
-        with patch("ai_generator.anthropic.Anthropic"):
-            generator = AIGenerator("test-key", "test-model")
+        assert chunks == [
+            ("text", "Let me "),
+            ("text", "search."),
+            ("preamble", "Let me search."),
+            ("text", "This is a test response from Claude."),
+        ]
 
-            assert hasattr(generator, "base_params")
-            assert generator.base_params["model"] == "test-model"
-            assert generator.base_params["temperature"] == 0
-            assert generator.base_params["max_tokens"] == 800
+    def test_generate_responses_batch(
+        self, mocker, generator, mock_anthropic_client_blank
+    ):
+        """Test batch answers come back in query order with failures as None"""
+        batches = mock_anthropic_client_blank.messages.batches
+        batches.create.return_value = SimpleNamespace(
+            id="batch-1", processing_status="in_progress"
+        )
+        batches.retrieve.return_value = SimpleNamespace(
+            id="batch-1", processing_status="ended"
+        )
+
+        def batch_result(custom_id, text=None):
+            if text is None:
+                result = SimpleNamespace(type="errored")
+            else:
+                message = SimpleNamespace(content=[_TextBlock(text)])
+                result = SimpleNamespace(type="succeeded", message=message)
+            return SimpleNamespace(custom_id=custom_id, result=result)
+
+        batches.results.return_value = [
+            batch_result("q2", "Answer two"),
+            batch_result("q1"),
+            batch_result("q0", "Answer zero"),
+        ]
 
-    def test_message_construction(self, mock_anthropic_client):
-        """Test message list construction"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
+        mock_sleep = mocker.patch("ai_generator.time.sleep")
 
-            query = "What is machine learning?"
-            generator.generate_response(query)
+        answers = generator.generate_responses_batch(["zero", "one", "two"])
 
-            call_args = mock_anthropic_client.messages.create.call_args[1]
-            messages = call_args["messages"]
+        assert answers == ["Answer zero", None, "Answer two"]
+        mock_sleep.assert_called_once_with(AIGenerator.BATCH_POLL_INTERVAL)
+        batches.retrieve.assert_called_once_with("batch-1")
+        batches.results.assert_called_once_with("batch-1")
 
-            assert len(messages) == 1
-            assert messages[0]["role"] == "user"
-            assert messages[0]["content"] == query
+        requests = batches.create.call_args.kwargs["requests"]
+        assert [r["custom_id"] for r in requests] == ["q0", "q1", "q2"]
+        assert requests[1]["params"]["messages"] == [{"role": "user", "content": "one"}]
+        assert "tools" not in requests[1]["params"]
 
-    def test_max_rounds_removes_tools(
-        self, mock_anthropic_client, mock_anthropic_response_tool_use, mock_tool_manager
+    def test_generate_responses_batch_timeout(
+        self, mocker, generator, mock_anthropic_client_blank
     ):
-        """Test that final API call removes tools parameter when max rounds reached"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            base_params = {
-                "model": "test-model",
-                "messages": [{"role": "user", "content": "test"}],
-                "system": "test system",
-                "tools": [{"name": "test_tool"}],
-                "tool_choice": {"type": "auto"},
-            }
+        """Test a batch still running at the deadline is cancelled and raises"""
+        batches = mock_anthropic_client_blank.messages.batches
+        batches.create.return_value = SimpleNamespace(
+            id="batch-1", processing_status="in_progress"
+        )
+        batches.retrieve.return_value = SimpleNamespace(
+            id="batch-1", processing_status="in_progress"
+        )
+        mock_sleep = mocker.patch("ai_generator.time.sleep")
+
+        with pytest.raises(TimeoutError, match="batch-1"):
+            generator.generate_responses_batch(["zero"], timeout=0)
+
+        batches.cancel.assert_called_once_with("batch-1")
+        batches.results.assert_not_called()
+        mock_sleep.assert_not_called()
+
+    def test_error_handling_api_exception(self, generator, mock_anthropic_client_blank):
+        """Test error handling when API raises exception"""
+        mock_anthropic_client_blank.messages.create.side_effect = Exception("API Error")
 
-            final_response = Mock()
-            final_response.content = [Mock(text="Final response after max rounds")]
-            final_response.stop_reason = "end_turn"
-            mock_anthropic_client.messages.create.return_value = final_response
+        with pytest.raises(Exception, match="API Error"):
+            generator.generate_response("Test query")
 
-            # Call with current_round=1 to simulate reaching max rounds
+    def test_error_handling_tool_manager_exception(
+        self, generator, mock_anthropic_response_tool_use, mock_tool_manager
+    ):
+        """Test error handling when tool manager raises exception"""
+        mock_tool_manager.execute_tool.side_effect = Exception("Tool execution failed")
+
+        # Should let the exception propagate or handle gracefully
+        with pytest.raises(Exception):
             generator._handle_tool_execution(
                 mock_anthropic_response_tool_use,
-                base_params,
+                {"messages": [], "system": "test"},
                 mock_tool_manager,
-                current_round=1,
             )
 
-            # Verify final call doesn't include tools when max rounds reached
-            final_call_args = mock_anthropic_client.messages.create.call_args[1]
-            assert "tools" not in final_call_args
-            assert "tool_choice" not in final_call_args
+    def test_response_content_access(self, generator, mock_anthropic_client_blank):
+        """Test accessing response content safely"""
+        # Test with malformed response (empty content)
+        malformed_response = SimpleNamespace(stop_reason="end_turn", content=[])
+
+        mock_anthropic_client_blank.messages.create.return_value = malformed_response
+
+        # Should raise an IndexError for empty content
+        with pytest.raises(IndexError):
+            generator.generate_response("Test query")
 
-    def test_sequential_tool_calls_two_rounds(
+    def test_default_tool_manager(
         self, mock_anthropic_client, sample_tools, mock_tool_manager
     ):
-        """Test sequential tool calling over two rounds"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            # Mock first tool use response
-            first_tool_response = Mock()
-            first_tool_response.stop_reason = "tool_use"
-            first_tool_content = Mock()
-            first_tool_content.type = "tool_use"
-            first_tool_content.name = "search_course_content"
-            first_tool_content.id = "tool_call_1"
-            first_tool_content.input = {"query": "course X outline"}
-            first_tool_response.content = [first_tool_content]
-
-            # Mock second tool use response
-            second_tool_response = Mock()
-            second_tool_response.stop_reason = "tool_use"
-            second_tool_content = Mock()
-            second_tool_content.type = "tool_use"
-            second_tool_content.name = "search_course_content"
-            second_tool_content.id = "tool_call_2"
-            second_tool_content.input = {"query": "machine learning courses"}
-            second_tool_response.content = [second_tool_content]
-
-            # Mock final response after second tool use
-            final_response = Mock()
-            final_response.content = [
-                Mock(text="Found course comparing ML topics from both searches")
-            ]
-            final_response.stop_reason = "end_turn"
-
-            # Configure API call sequence
-            mock_anthropic_client.messages.create.side_effect = [
-                first_tool_response,  # Initial call
-                second_tool_response,  # First round result
-                final_response,  # Second round result
-            ]
+        """Test a tool manager given at construction supplies default tools"""
+        # Like ToolManager, build a new list on every call
+        mock_tool_manager.get_tool_definitions.side_effect = lambda: [
+            dict(tool) for tool in sample_tools
+        ]
 
-            # Configure tool manager
-            mock_tool_manager.execute_tool.side_effect = [
-                "Course X has 4 lessons: Lesson 4 is about Machine Learning",
-                "Found 3 courses about Machine Learning: ML101, ML Advanced, ML Basics",
-            ]
+        generator = AIGenerator(
+            "test-key", "test-model", tool_manager=mock_tool_manager
+        )
 
-            response = generator.generate_response(
-                "Search for a course that discusses the same topic as lesson 4 of course X",
-                tools=sample_tools,
-                tool_manager=mock_tool_manager,
-            )
+        generator.generate_response("First query")
+        first_tools = mock_anthropic_client.messages.create.call_args[1]["tools"]
+        generator.generate_response("Second query")
+        second_tools = mock_anthropic_client.messages.create.call_args[1]["tools"]
 
-            assert response == "Found course comparing ML topics from both searches"
+        assert first_tools[0]["name"] == "search_course_content"
+        # Equal definitions keep hitting the cache-marked copy
+        assert second_tools is first_tools
 
-            # Verify two tool calls were made
-            assert mock_tool_manager.execute_tool.call_count == 2
-            mock_tool_manager.execute_tool.assert_any_call(
-                "search_course_content", query="course X outline"
-            )
-            mock_tool_manager.execute_tool.assert_any_call(
-                "search_course_content", query="machine learning courses"
-            )
+    def test_tools_dropped_without_tool_manager(
+        self, generator, mock_anthropic_client, sample_tools
+    ):
+        """Test tools are not sent when there is no manager to run them"""
+        with pytest.warns(RuntimeWarning, match="without a tool_manager"):
+            response = generator.generate_response("Test query", tools=sample_tools)
+
+        assert response == "This is a test response from Claude."
+        call_args = SimpleNamespace(
+            **mock_anthropic_client.messages.create.call_args.kwargs
+        )
+        assert not hasattr(call_args, "tools")
+        assert not hasattr(call_args, "tool_choice")
+
+    def test_base_params_optimization(self, shared_generator):
+        """Test that base parameters are pre-built for efficiency"""
+        # Only reads constructor state, so the shared generator needs no reset
+        base_params = shared_generator.base_params
+        assert base_params == _EXPECTED_BASE_PARAMS
 
-            # Verify three API calls were made
-            assert mock_anthropic_client.messages.create.call_count == 3
+        # Base parameters are shared across calls and must not be mutated
+        with pytest.raises(TypeError):
+            base_params["model"] = "other-model"
 
-    def test_sequential_tool_calls_max_rounds_reached(
-        self, mock_anthropic_client, sample_tools, mock_tool_manager
+    def test_max_rounds_removes_tools(
+        self,
+        generator,
+        mock_anthropic_client_blank,
+        mock_anthropic_response_tool_use,
+        mock_tool_manager,
     ):
-        """Test that tool calling stops after 2 rounds maximum"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            # Mock tool use responses for both rounds
-            tool_response = Mock()
-            tool_response.stop_reason = "tool_use"
-            tool_content = Mock()
-            tool_content.type = "tool_use"
-            tool_content.name = "search_course_content"
-            tool_content.id = "tool_call_id"
-            tool_content.input = {"query": "test query"}
-            tool_response.content = [tool_content]
-
-            # Mock final response without tools
-            final_response = Mock()
-            final_response.content = [Mock(text="Final answer after 2 rounds")]
-            final_response.stop_reason = "end_turn"
-
-            # Configure API call sequence - Claude wants tools in both rounds
-            mock_anthropic_client.messages.create.side_effect = [
-                tool_response,  # Initial call
-                tool_response,  # First round - wants tools again
-                final_response,  # Second round - forced final response
-            ]
-
-            mock_tool_manager.execute_tool.return_value = "Tool result"
+        """Test that final API call removes tools parameter when max rounds reached"""
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test"}],
+            "system": "test system",
+            "tools": [{"name": "test_tool"}],
+            "tool_choice": {"type": "auto"},
+        }
+
+        final_response = _text_response("Final response after max rounds")
+        mock_anthropic_client_blank.messages.create.return_value = final_response
+
+        # Call with current_round=1 to simulate reaching max rounds
+        generator._handle_tool_execution(
+            mock_anthropic_response_tool_use,
+            base_params,
+            mock_tool_manager,
+            current_round=1,
+        )
+
+        # Verify final call doesn't include tools when max rounds reached
+        final_call_args = SimpleNamespace(
+            **mock_anthropic_client_blank.messages.create.call_args.kwargs
+        )
+        assert not hasattr(final_call_args, "tools")
+        assert not hasattr(final_call_args, "tool_choice")
+
+    @pytest.mark.parametrize(
+        "queries, tool_results, final_text",
+        [
+            pytest.param(
+                ["Python basics"],
+                ["Python course information"],
+                "Python is a programming language",
+                id="single_round",
+            ),
+            pytest.param(
+                ["course X outline", "machine learning courses"],
+                [
+                    "Course X has 4 lessons: Lesson 4 is about Machine Learning",
+                    "Found 3 courses about Machine Learning: ML101, ML Advanced",
+                ],
+                "Found course comparing ML topics from both searches",
+                id="two_rounds",
+            ),
+            pytest.param(
+                ["test query", "test query"],
+                ["Tool result", "Tool result"],
+                "Final answer after 2 rounds",
+                id="max_rounds_reached",
+            ),
+        ],
+    )
+    def test_sequential_tool_calls(
+        self,
+        generator,
+        mock_anthropic_client_blank,
+        sample_tools,
+        mock_tool_manager,
+        queries,
+        tool_results,
+        final_text,
+    ):
+        """Test tool calling over one or more rounds, capped at MAX_TOOL_ROUNDS"""
+        mock_anthropic_client_blank.messages.create.side_effect = [
+            *(
+                _tool_response(
+                    _tool_use("search_course_content", f"tool_call_{i}", query=query)
+                )
+                for i, query in enumerate(queries)
+            ),
+            _text_response(final_text),
+        ]
+        mock_tool_manager.execute_tool.side_effect = tool_results
 
-            response = generator.generate_response(
-                "Complex query requiring multiple searches",
-                tools=sample_tools,
-                tool_manager=mock_tool_manager,
-            )
+        response = generator.generate_response(
+            "Complex query requiring searches",
+            tools=sample_tools,
+            tool_manager=mock_tool_manager,
+        )
 
-            assert response == "Final answer after 2 rounds"
+        assert response == final_text
 
-            # Should execute tools exactly 2 times (once per round)
-            assert mock_tool_manager.execute_tool.call_count == 2
+        # One tool execution per round, in order
+        assert mock_tool_manager.execute_tool.call_args_list == [
+            call("search_course_content", query=query) for query in queries
+        ]
 
-            # Should make exactly 3 API calls (initial + 2 rounds)
-            assert mock_anthropic_client.messages.create.call_count == 3
+        # Initial call plus one call per round
+        assert (
+            mock_anthropic_client_blank.messages.create.call_count == len(queries) + 1
+        )
 
-            # Last call should not include tools
-            final_call_args = mock_anthropic_client.messages.create.call_args[1]
-            assert "tools" not in final_call_args
+        # Tools are only withheld once the round limit is reached
+        final_call_args = SimpleNamespace(
+            **mock_anthropic_client_blank.messages.create.call_args.kwargs
+        )
+        reached_limit = len(queries) == AIGenerator.MAX_TOOL_ROUNDS
+        assert hasattr(final_call_args, "tools") is not reached_limit
 
     def test_tool_execution_error_first_round(
-        self, mock_anthropic_client, mock_anthropic_response_tool_use
+        self, generator, mock_anthropic_response_tool_use, mock_tool_manager
     ):
         """Test error handling in first round - should raise exception"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            mock_tool_manager = Mock()
-            mock_tool_manager.execute_tool.side_effect = Exception(
-                "Tool execution failed"
-            )
+        mock_tool_manager.execute_tool.side_effect = Exception("Tool execution failed")
 
-            base_params = {
-                "model": "test-model",
-                "messages": [{"role": "user", "content": "test"}],
-                "system": "test system",
-            }
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test"}],
+            "system": "test system",
+        }
 
-            # Should raise exception for first round error
-            with pytest.raises(Exception, match="Tool execution failed"):
-                generator._handle_tool_execution(
-                    mock_anthropic_response_tool_use,
-                    base_params,
-                    mock_tool_manager,
-                    current_round=0,
-                )
+        # Should raise exception for first round error
+        with pytest.raises(Exception, match="Tool execution failed"):
+            generator._handle_tool_execution(
+                mock_anthropic_response_tool_use,
+                base_params,
+                mock_tool_manager,
+                current_round=0,
+            )
 
     def test_tool_execution_error_second_round(
-        self, mock_anthropic_client, mock_anthropic_response_tool_use
+        self, generator, mock_anthropic_response_tool_use, mock_tool_manager
     ):
         """Test error handling in second round - should return friendly message"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            mock_tool_manager = Mock()
-            mock_tool_manager.execute_tool.side_effect = Exception(
-                "Tool execution failed"
-            )
+        mock_tool_manager.execute_tool.side_effect = Exception("Tool execution failed")
+
+        base_params = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "test"}],
+            "system": "test system",
+        }
+
+        # Should return friendly error message for second round error
+        result = generator._handle_tool_execution(
+            mock_anthropic_response_tool_use,
+            base_params,
+            mock_tool_manager,
+            current_round=1,
+        )
+
+        assert "encountered an issue while searching" in result
+        assert "Please try rephrasing" in result
+
+    async def test_agenerate_response_text_only(
+        self, mocker, mock_anthropic_response_text
+    ):
+        """Test async response generation without tools"""
+        mock_async_client = Mock()
+        mock_async_client.messages.create = AsyncMock(
+            return_value=mock_anthropic_response_text
+        )
 
-            base_params = {
-                "model": "test-model",
-                "messages": [{"role": "user", "content": "test"}],
-                "system": "test system",
-            }
+        mocker.patch(
+            "ai_generator.anthropic.AsyncAnthropic", return_value=mock_async_client
+        )
 
-            # Should return friendly error message for second round error
-            result = generator._handle_tool_execution(
-                mock_anthropic_response_tool_use,
-                base_params,
-                mock_tool_manager,
-                current_round=1,
-            )
+        generator = AIGenerator("test-key", "test-model")
 
-            assert "encountered an issue while searching" in result
-            assert "Please try rephrasing" in result
+        response = await generator.agenerate_response("What is Python?")
 
-    def test_single_round_tool_use_still_works(
-        self, mock_anthropic_client, sample_tools, mock_tool_manager
+        assert response == "This is a test response from Claude."
+        call_args = SimpleNamespace(
+            **mock_async_client.messages.create.call_args.kwargs
+        )
+        assert call_args.messages == [{"role": "user", "content": "What is Python?"}]
+
+    async def test_agenerate_response_multiple_tools(
+        self, mocker, sample_tools, mock_tool_manager
     ):
-        """Test that single round tool usage still works as before"""
-        with patch(
-            "ai_generator.anthropic.Anthropic", return_value=mock_anthropic_client
-        ):
-            generator = AIGenerator("test-key", "test-model")
-
-            # Mock tool use response
-            tool_response = Mock()
-            tool_response.stop_reason = "tool_use"
-            tool_content = Mock()
-            tool_content.type = "tool_use"
-            tool_content.name = "search_course_content"
-            tool_content.id = "tool_call_1"
-            tool_content.input = {"query": "Python basics"}
-            tool_response.content = [tool_content]
-
-            # Mock response after tool execution (no more tool use)
-            final_response = Mock()
-            final_response.content = [Mock(text="Python is a programming language")]
-            final_response.stop_reason = "end_turn"
-
-            mock_anthropic_client.messages.create.side_effect = [
-                tool_response,
-                final_response,
-            ]
+        """Test async generation executes every tool call of a response"""
+        tool_response = _tool_response(*_TWO_TOOLS)
 
-            mock_tool_manager.execute_tool.return_value = "Python course information"
+        final_response = _text_response("Async tools handled")
 
-            response = generator.generate_response(
-                "What is Python?", tools=sample_tools, tool_manager=mock_tool_manager
-            )
+        mock_async_client = Mock()
+        mock_async_client.messages.create = AsyncMock(
+            side_effect=[tool_response, final_response]
+        )
+        mock_tool_manager.execute_tool.side_effect = lambda name, query: (
+            f"Result for {query}"
+        )
+
+        mocker.patch(
+            "ai_generator.anthropic.AsyncAnthropic", return_value=mock_async_client
+        )
 
-            assert response == "Python is a programming language"
-            assert mock_tool_manager.execute_tool.call_count == 1
-            assert mock_anthropic_client.messages.create.call_count == 2
+        generator = AIGenerator("test-key", "test-model")
+
+        response = await generator.agenerate_response(
+            "Compare courses", tools=sample_tools, tool_manager=mock_tool_manager
+        )
+
+        assert response == "Async tools handled"
+        assert mock_tool_manager.execute_tool.call_count == 2
+
+        # Results are matched to their tool_use ids in order
+        messages = mock_async_client.messages.create.call_args[1]["messages"]
+        assert messages[2]["content"] == [
+            {
+                "type": "tool_result",
+                "tool_use_id": "tool1_id",
+                "content": "Result for first query",
+            },
+            {
+                "type": "tool_result",
+                "tool_use_id": "tool2_id",
+                "content": "Result for second query",
+            },
+        ]
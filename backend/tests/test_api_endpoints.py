@@ -5,259 +5,353 @@ Tests all API endpoints including request/response validation,
 error handling, and edge cases.
 """
 
+import asyncio
+import importlib
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
 import pytest
-from fastapi.testclient import TestClient
 from fastapi import status
-from unittest.mock import Mock, patch
-import json
+from fastapi.testclient import TestClient
+
+LONG_QUERY = "What is Python? " * 1000  # ~16 KB query body
+TEST_QUERY = {"query": "test"}
+EXTRA_FIELDS_QUERY = {
+    "query": "What is Python?",
+    "extra_field": "should be ignored",
+    "another_field": 12345,
+}
+
+
+def response_model(app, path):
+    """Return the pydantic response model declared for an app route"""
+    return next(
+        route.response_model
+        for route in app.routes
+        if getattr(route, "path", None) == path
+    )
+
+
+def parse_events(response):
+    """Decode the data lines of a server-sent event stream"""
+    return [
+        json.loads(line[len("data: ") :])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+@pytest.fixture(scope="module")
+def real_app():
+    """Import backend/app.py with RAGSystem replaced by a mock"""
+    backend_dir = Path(__file__).resolve().parent.parent
+    with pytest.MonkeyPatch.context() as mp, patch("rag_system.RAGSystem"):
+        # The frontend is mounted from ../frontend relative to the backend dir
+        mp.chdir(backend_dir)
+        mp.delitem(sys.modules, "app", raising=False)
+        app_module = importlib.import_module("app")
+    yield app_module
+    sys.modules.pop("app", None)
+
+
+@pytest.fixture
+def real_client(real_app):
+    """Test client for the real app, with a freshly reset mock RAG system"""
+    real_app.rag_system.reset_mock(return_value=True, side_effect=True)
+    real_app.rag_system.session_manager.create_session.return_value = "new-session"
+    # The lifespan handler is not run without the context manager
+    return TestClient(real_app.app)
 
 
 @pytest.mark.api
 class TestQueryEndpoint:
     """Test cases for /api/query endpoint"""
-    
-    def test_query_with_session_id(self, test_client, sample_query_request, expected_query_response):
-        """Test query endpoint with provided session ID"""
-        response = test_client.post("/api/query", json=sample_query_request)
-        
+
+    @pytest.mark.parametrize(
+        "payload, expected_session",
+        [
+            (
+                {"query": "What is Python programming?", "session_id": "test-123"},
+                "test-123",
+            ),
+            ({"query": ""}, "test-session-123"),
+            ({"query": LONG_QUERY}, "test-session-123"),
+        ],
+        ids=["with_session", "empty", "long"],
+    )
+    def test_query_payloads(self, test_client, payload, expected_session):
+        """Test query endpoint accepts normal, empty and very long queries"""
+        response = test_client.post("/api/query", json=payload)
+
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        
-        assert "answer" in data
-        assert "sources" in data
-        assert "session_id" in data
-        assert data["session_id"] == sample_query_request["session_id"]
-        assert isinstance(data["sources"], list)
-    
-    def test_query_without_session_id(self, test_client, sample_query_request_no_session):
+        assert response.json() == {
+            "answer": "Test answer",
+            "sources": ["Test source"],
+            "session_id": expected_session,  # Mock creates "test-session-123"
+        }
+
+    def test_query_without_session_id(
+        self, test_client, sample_query_request_no_session, expected_query_response
+    ):
         """Test query endpoint without session ID - should create new session"""
         response = test_client.post("/api/query", json=sample_query_request_no_session)
-        
-        assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        
-        assert "answer" in data
-        assert "sources" in data
-        assert "session_id" in data
-        assert data["session_id"] == "test-session-123"  # Mock returns this
-    
-    def test_query_invalid_request(self, test_client, invalid_query_request):
-        """Test query endpoint with invalid request data"""
-        response = test_client.post("/api/query", json=invalid_query_request)
-        
-        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
-    
-    def test_query_missing_required_field(self, test_client):
-        """Test query endpoint with missing required query field"""
-        response = test_client.post("/api/query", json={"session_id": "test"})
-        
-        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
-    
-    def test_query_empty_string(self, test_client):
-        """Test query endpoint with empty query string"""
-        response = test_client.post("/api/query", json={"query": ""})
-        
+
         assert response.status_code == status.HTTP_200_OK
-        # Should still process empty query
-    
+        assert (
+            response.json() == expected_query_response
+        )  # Mock creates "test-session-123"
+
     def test_query_server_error(self, test_client, test_app):
         """Test query endpoint when RAG system raises exception"""
         # Configure the mock to raise an exception
-        test_app.state.mock_rag.query.side_effect = Exception("Database connection failed")
-        
-        response = test_client.post("/api/query", json={"query": "test"})
-        
+        test_app.state.mock_rag.query.side_effect = Exception(
+            "Database connection failed"
+        )
+
+        response = test_client.post("/api/query", json=TEST_QUERY)
+
         assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
         assert "Database connection failed" in response.json()["detail"]
-        
-        # Reset the mock for other tests
-        test_app.state.mock_rag.query.side_effect = None
-        test_app.state.mock_rag.query.return_value = ("Test answer", ["Test source"])
-    
-    def test_query_response_schema(self, test_client, sample_query_request):
+
+    def test_query_response_schema(self, test_client, test_app, sample_query_request):
         """Test that query response matches expected schema"""
         response = test_client.post("/api/query", json=sample_query_request)
-        
+
+        assert response.status_code == status.HTTP_200_OK
+        response_model(test_app, "/api/query").model_validate_json(
+            response.content, strict=True
+        )
+
+
+@pytest.mark.api
+class TestAppQueryEndpoint:
+    """Test cases for /api/query as defined in backend/app.py"""
+
+    def test_query_runs_off_event_loop(self, real_client, real_app):
+        """Test the blocking RAG query does not run on the event loop"""
+
+        def blocking_query(query, session_id):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return "Threadpool answer", []
+            return "Event loop answer", []
+
+        real_app.rag_system.query.side_effect = blocking_query
+
+        response = real_client.post("/api/query", json=TEST_QUERY)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["answer"] == "Threadpool answer"
+
+
+@pytest.mark.api
+class TestAppQueryStreamEndpoint:
+    """Test cases for /api/query/stream as defined in backend/app.py"""
+
+    def test_query_stream_framing(self, real_client, real_app):
+        """Test each event is a data line followed by a blank line"""
+        real_app.rag_system.query_stream.return_value = iter(
+            [
+                {"type": "text", "text": "Hello"},
+                {"type": "sources", "sources": ["Course A - Lesson 1"]},
+            ]
+        )
+
+        response = real_client.post(
+            "/api/query/stream", json={"query": "test", "session_id": "session-1"}
+        )
+
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        
-        # Validate response structure
-        required_fields = ["answer", "sources", "session_id"]
-        for field in required_fields:
-            assert field in data
-        
-        assert isinstance(data["answer"], str)
-        assert isinstance(data["sources"], list)
-        assert isinstance(data["session_id"], str)
-    
-    def test_query_long_text(self, test_client):
-        """Test query endpoint with very long query text"""
-        long_query = "What is Python? " * 1000  # Very long query
-        response = test_client.post("/api/query", json={"query": long_query})
-        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.text == (
+            'data: {"type": "text", "text": "Hello"}\n\n'
+            'data: {"type": "sources", "sources": ["Course A - Lesson 1"], '
+            '"session_id": "session-1"}\n\n'
+        )
+        real_app.rag_system.query_stream.assert_called_once_with("test", "session-1")
+
+    def test_query_stream_creates_session(self, real_client, real_app):
+        """Test a session is created when the request has none"""
+        real_app.rag_system.query_stream.return_value = iter(
+            [
+                {"type": "sources", "sources": []},
+            ]
+        )
+
+        response = real_client.post("/api/query/stream", json=TEST_QUERY)
+
+        assert parse_events(response) == [
+            {"type": "sources", "sources": [], "session_id": "new-session"}
+        ]
+        real_app.rag_system.query_stream.assert_called_once_with("test", "new-session")
+
+    def test_query_stream_error(self, real_client, real_app):
+        """Test errors raised mid-stream are reported as an error event"""
+
+        def failing_stream(query, session_id):
+            yield {"type": "text", "text": "Partial"}
+            raise RuntimeError("Stream failed")
+
+        real_app.rag_system.query_stream.side_effect = failing_stream
+
+        response = real_client.post("/api/query/stream", json=TEST_QUERY)
+
         assert response.status_code == status.HTTP_200_OK
+        assert parse_events(response) == [
+            {"type": "text", "text": "Partial"},
+            {"type": "error", "detail": "Stream failed"},
+        ]
+
+
+@pytest.mark.api
+class TestAppLifespan:
+    """Test cases for the startup/shutdown handler in backend/app.py"""
+
+    def test_shutdown_closes_http_clients(self, real_client, real_app, monkeypatch):
+        """Test the shared HTTP pools are closed when the app shuts down"""
+        aclose = AsyncMock()
+        monkeypatch.setattr(real_app, "aclose_http_clients", aclose)
+
+        with real_client:
+            aclose.assert_not_awaited()
+
+        aclose.assert_awaited_once_with()
 
 
 @pytest.mark.api
 class TestCoursesEndpoint:
     """Test cases for /api/courses endpoint"""
-    
+
     def test_get_course_stats(self, test_client, expected_course_stats):
         """Test getting course statistics"""
         response = test_client.get("/api/courses")
-        
+
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        
-        assert "total_courses" in data
-        assert "course_titles" in data
-        assert data["total_courses"] == expected_course_stats["total_courses"]
-        assert data["course_titles"] == expected_course_stats["course_titles"]
-    
-    def test_course_stats_response_schema(self, test_client):
+        assert response.json() == expected_course_stats
+
+    def test_course_stats_response_schema(self, test_client, test_app):
         """Test that course stats response matches expected schema"""
         response = test_client.get("/api/courses")
-        
+
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        
-        # Validate response structure
-        required_fields = ["total_courses", "course_titles"]
-        for field in required_fields:
-            assert field in data
-        
-        assert isinstance(data["total_courses"], int)
-        assert isinstance(data["course_titles"], list)
-        assert data["total_courses"] >= 0
-    
+        stats = response_model(test_app, "/api/courses").model_validate_json(
+            response.content, strict=True
+        )
+        assert stats.total_courses >= 0
+
     def test_course_stats_server_error(self, test_client, test_app):
         """Test course stats endpoint when RAG system raises exception"""
         # Configure the mock to raise an exception
-        test_app.state.mock_rag.get_course_analytics.side_effect = Exception("Analytics service unavailable")
-        
+        test_app.state.mock_rag.get_course_analytics.side_effect = Exception(
+            "Analytics service unavailable"
+        )
+
         response = test_client.get("/api/courses")
-        
+
         assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
         assert "Analytics service unavailable" in response.json()["detail"]
-        
-        # Reset the mock for other tests
-        test_app.state.mock_rag.get_course_analytics.side_effect = None
-        test_app.state.mock_rag.get_course_analytics.return_value = {
-            "total_courses": 2,
-            "course_titles": ["Python Programming", "Data Science"]
-        }
-    
+
     def test_course_stats_no_courses(self, test_client, test_app):
         """Test course stats when no courses are available"""
         # Mock empty course analytics
         test_app.state.mock_rag.get_course_analytics.return_value = {
             "total_courses": 0,
-            "course_titles": []
+            "course_titles": [],
         }
-        
+
         response = test_client.get("/api/courses")
-        
+
         assert response.status_code == status.HTTP_200_OK
-        data = response.json()
-        assert data["total_courses"] == 0
-        assert data["course_titles"] == []
+        assert response.json() == {"total_courses": 0, "course_titles": []}
 
 
 @pytest.mark.api
 class TestAPIHeaders:
     """Test API headers and CORS configuration"""
-    
+
     def test_cors_headers(self, test_client):
         """Test that CORS headers are properly set"""
-        response = test_client.options("/api/query")
-        
+        response = test_client.options(
+            "/api/query",
+            headers={
+                "Origin": "http://localhost",
+                "Access-Control-Request-Method": "POST",
+            },
+        )
+
         # Should allow CORS preflight
-        assert response.status_code in [status.HTTP_200_OK, status.HTTP_405_METHOD_NOT_ALLOWED]
-    
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["access-control-allow-origin"] in (
+            "*",
+            "http://localhost",
+        )
+        assert "POST" in response.headers["access-control-allow-methods"]
+
     def test_content_type_json(self, test_client, sample_query_request):
         """Test that API accepts and returns JSON content"""
         response = test_client.post(
-            "/api/query", 
+            "/api/query",
             json=sample_query_request,
-            headers={"Content-Type": "application/json"}
+            headers={"Content-Type": "application/json"},
         )
-        
+
         assert response.status_code == status.HTTP_200_OK
         assert "application/json" in response.headers.get("content-type", "")
 
 
-@pytest.mark.api 
+@pytest.mark.api
 class TestAPIValidation:
     """Test API request validation and error handling"""
-    
-    def test_invalid_json(self, test_client):
-        """Test API with invalid JSON payload"""
-        response = test_client.post(
-            "/api/query",
-            data="invalid json",
-            headers={"Content-Type": "application/json"}
-        )
-        
+
+    @pytest.mark.parametrize(
+        "payload, content_type",
+        [
+            ({"invalid_field": "This should fail validation"}, "json"),
+            ({"session_id": "test"}, "json"),
+            ("invalid json", "raw"),
+            ({"query": 12345, "session_id": ["not", "a", "string"]}, "json"),
+        ],
+        ids=["invalid_request", "missing_query", "bad_json", "wrong_types"],
+    )
+    def test_invalid_request(self, test_client, payload, content_type):
+        """Test that malformed query requests are rejected with 422"""
+        if content_type == "json":
+            response = test_client.post("/api/query", json=payload)
+        else:
+            response = test_client.post(
+                "/api/query",
+                content=payload,
+                headers={"Content-Type": "application/json"},
+            )
+
         assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
-    
+
     def test_extra_fields_ignored(self, test_client):
         """Test that extra fields in request are ignored"""
-        request_data = {
-            "query": "What is Python?",
-            "extra_field": "should be ignored",
-            "another_field": 12345
-        }
-        
-        response = test_client.post("/api/query", json=request_data)
-        
+        response = test_client.post("/api/query", json=EXTRA_FIELDS_QUERY)
+
         assert response.status_code == status.HTTP_200_OK
-    
-    def test_wrong_data_types(self, test_client):
-        """Test API with wrong data types in request"""
-        request_data = {
-            "query": 12345,  # Should be string
-            "session_id": ["not", "a", "string"]  # Should be string
-        }
-        
-        response = test_client.post("/api/query", json=request_data)
-        
-        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
 
 @pytest.mark.api
-@pytest.mark.integration
 class TestAPIIntegration:
     """Integration tests for API endpoints"""
-    
-    def test_query_and_courses_integration(self, test_client):
-        """Test that query and courses endpoints work together"""
-        # First, get course stats
-        courses_response = test_client.get("/api/courses")
-        assert courses_response.status_code == status.HTTP_200_OK
-        
-        # Then, make a query
-        query_response = test_client.post("/api/query", json={"query": "test"})
-        assert query_response.status_code == status.HTTP_200_OK
-        
-        # Both should work independently
-        courses_data = courses_response.json()
-        query_data = query_response.json()
-        
-        assert "total_courses" in courses_data
-        assert "answer" in query_data
-    
+
     def test_session_persistence(self, test_client):
         """Test that session IDs work correctly across requests"""
         # First query - no session ID provided
         response1 = test_client.post("/api/query", json={"query": "test 1"})
         session_id = response1.json()["session_id"]
-        
+
         # Second query - use same session ID
-        response2 = test_client.post("/api/query", json={
-            "query": "test 2", 
-            "session_id": session_id
-        })
-        
+        response2 = test_client.post(
+            "/api/query", json={"query": "test 2", "session_id": session_id}
+        )
+
         assert response1.status_code == status.HTTP_200_OK
         assert response2.status_code == status.HTTP_200_OK
         assert response2.json()["session_id"] == session_id
@@ -267,32 +361,33 @@ class TestAPIIntegration:
 @pytest.mark.slow
 class TestAPIPerformance:
     """Performance and load testing for API endpoints"""
-    
-    def test_concurrent_queries(self, test_client):
-        """Test multiple concurrent queries"""
-        import concurrent.futures
-        import threading
-        
-        def make_query(query_num):
-            return test_client.post("/api/query", json={"query": f"test query {query_num}"})
-        
-        # Make 10 concurrent requests
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(make_query, i) for i in range(10)]
-            responses = [future.result() for future in concurrent.futures.as_completed(futures)]
-        
-        # All should succeed
-        for response in responses:
-            assert response.status_code == status.HTTP_200_OK
-    
+
+    @pytest.mark.parametrize("query_num", range(10))
+    def test_query_smoke(self, test_client, query_num):
+        """Test repeated queries each succeed (spread across xdist workers)"""
+        response = test_client.post(
+            "/api/query", json={"query": f"test query {query_num}"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+
+    async def test_concurrent_queries(self, async_test_client):
+        """Test that concurrent queries are all handled successfully"""
+        responses = await asyncio.gather(
+            *[
+                async_test_client.post("/api/query", json={"query": f"test query {i}"})
+                for i in range(10)
+            ]
+        )
+
+        assert all(r.status_code == status.HTTP_200_OK for r in responses)
+
     def test_api_response_time(self, test_client):
         """Test that API responses are reasonably fast"""
-        import time
-        
         start_time = time.time()
         response = test_client.post("/api/query", json={"query": "quick test"})
         end_time = time.time()
-        
+
         assert response.status_code == status.HTTP_200_OK
         # Response should be under 5 seconds (generous for testing)
-        assert (end_time - start_time) < 5.0
\ No newline at end of file
+        assert (end_time - start_time) < 5.0
@@ -5,6 +5,8 @@ Tests the execute method of CourseSearchTool with various scenarios
 including successful searches, empty results, errors, and edge cases.
 """
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict
 from unittest.mock import Mock, patch
 
@@ -165,12 +167,12 @@ class TestCourseSearchTool:
             distances=[0.1],
         )
 
-        result = tool._format_results(search_results)
+        result, sources = tool._format_results(search_results)
 
         assert "[Test Course]" in result
         assert "Content without lesson number" in result
-        assert len(tool.last_sources) == 1
-        assert tool.last_sources[0] == "Test Course"
+        assert len(sources) == 1
+        assert sources[0] == "Test Course"
 
     def test_format_results_with_lesson_number(self):
         """Test result formatting when lesson_number is provided"""
@@ -185,12 +187,12 @@ class TestCourseSearchTool:
             distances=[0.1],
         )
 
-        result = tool._format_results(search_results)
+        result, sources = tool._format_results(search_results)
 
         assert "[Test Course - Lesson 3]" in result
         assert "Content with lesson number" in result
-        assert len(tool.last_sources) == 1
-        assert tool.last_sources[0] == "Test Course - Lesson 3"
+        assert len(sources) == 1
+        assert sources[0] == "Test Course - Lesson 3"
 
     def test_format_results_multiple_documents(self):
         """Test formatting multiple documents"""
@@ -206,14 +208,14 @@ class TestCourseSearchTool:
             distances=[0.1, 0.2],
         )
 
-        result = tool._format_results(search_results)
+        result, sources = tool._format_results(search_results)
 
         assert "[Course A - Lesson 1]" in result
         assert "[Course B - Lesson 2]" in result
         assert "First document" in result
         assert "Second document" in result
         assert "\n\n" in result  # Documents should be separated by double newline
-        assert len(tool.last_sources) == 2
+        assert len(sources) == 2
 
     def test_format_results_missing_metadata(self):
         """Test handling of missing metadata fields"""
@@ -226,7 +228,7 @@ class TestCourseSearchTool:
             distances=[0.1],
         )
 
-        result = tool._format_results(search_results)
+        result, _ = tool._format_results(search_results)
 
         assert "[unknown]" in result
         assert "Document with missing metadata" in result
@@ -415,6 +417,41 @@ class TestToolManager:
         assert search_tool1.last_sources == []
         assert search_tool2.last_sources == []
 
+    def test_get_last_sources_parallel_searches(self):
+        """Test sources from concurrent searches on one tool are all kept"""
+        manager = ToolManager()
+        mock_vector_store = Mock()
+        both_searching = threading.Barrier(2)
+
+        def search(query, course_name=None, lesson_number=None):
+            # Hold both calls until each has started, so they overlap
+            both_searching.wait(timeout=5)
+            return SearchResults(
+                documents=[f"{query} content"],
+                metadata=[{"course_title": query, "lesson_number": 1}],
+                distances=[0.1],
+            )
+
+        mock_vector_store.search.side_effect = search
+        manager.register_tool(CourseSearchTool(mock_vector_store))
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            results = list(
+                executor.map(
+                    lambda query: manager.execute_tool(
+                        "search_course_content", query=query
+                    ),
+                    ["Course A", "Course B"],
+                )
+            )
+
+        assert "Course A content" in results[0]
+        assert "Course B content" in results[1]
+        assert sorted(manager.get_last_sources()) == [
+            "Course A - Lesson 1",
+            "Course B - Lesson 1",
+        ]
+
 
 class TestToolEdgeCases:
     """Test edge cases and error conditions"""
@@ -465,6 +502,6 @@ class TestToolEdgeCases:
         )
 
         # Should handle gracefully without crashing
-        result = tool._format_results(search_results)
+        result, _ = tool._format_results(search_results)
         assert "Doc1" in result
         # Should not crash even with mismatched data
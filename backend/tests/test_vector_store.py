@@ -7,6 +7,7 @@ Tests the search functionality, course management, and ChromaDB integration.
 import json
 import shutil
 import tempfile
+from types import SimpleNamespace
 from typing import Any, Dict, List
 from unittest.mock import MagicMock, Mock, patch
 
@@ -14,6 +15,56 @@ import pytest
 from models import Course, CourseChunk, Lesson
 from vector_store import SearchResults, VectorStore
 
+# Serialized lessons_json payloads as stored in course catalog metadata
+LESSONS_JSON_ONE = json.dumps(
+    [{"lesson_number": 1, "lesson_title": "Lesson 1", "lesson_link": "link1"}]
+)
+LESSONS_JSON_TWO = json.dumps(
+    [
+        {"lesson_number": 1, "lesson_link": "https://example.com/lesson1"},
+        {"lesson_number": 2, "lesson_link": "https://example.com/lesson2"},
+    ]
+)
+
+# (search kwargs, resolved course title, expected query kwargs, expected error)
+SEARCH_CASES = [
+    pytest.param({}, None, {"n_results": 5, "where": None}, None, id="basic_query"),
+    pytest.param(
+        {"course_name": "Partial Course"},
+        "Full Course Title",
+        {"n_results": 5, "where": {"course_title": "Full Course Title"}},
+        None,
+        id="course_name_resolution",
+    ),
+    pytest.param(
+        {"course_name": "Unknown Course"},
+        None,
+        None,
+        "No course found matching 'Unknown Course'",
+        id="course_name_not_found",
+    ),
+    pytest.param(
+        {"lesson_number": 2},
+        None,
+        {"n_results": 5, "where": {"lesson_number": 2}},
+        None,
+        id="lesson_number",
+    ),
+    pytest.param(
+        {"course_name": "Test", "lesson_number": 3},
+        "Test Course",
+        {
+            "n_results": 5,
+            "where": {"$and": [{"course_title": "Test Course"}, {"lesson_number": 3}]},
+        },
+        None,
+        id="both_filters",
+    ),
+    pytest.param(
+        {"limit": 10}, None, {"n_results": 10, "where": None}, None, id="custom_limit"
+    ),
+]
+
 
 class TestSearchResults:
     """Test cases for SearchResults dataclass"""
@@ -76,30 +127,50 @@ class TestSearchResults:
         assert results.is_empty() is False
 
 
+@pytest.fixture(scope="module")
+def mock_chroma_client():
+    """Create a stub ChromaDB client shared by the module"""
+    # Only the collection's calls are asserted on, so the client is a plain stub
+    mock_collection = Mock()
+    mock_client = SimpleNamespace(
+        get_or_create_collection=lambda *args, **kwargs: mock_collection
+    )
+    return mock_client, mock_collection
+
+
+@pytest.fixture(scope="module")
+def mock_vector_store(mock_chroma_client, tmp_path_factory):
+    """Create VectorStore with mocked ChromaDB client, built once per module"""
+    mock_client, mock_collection = mock_chroma_client
+    chroma_dir = str(tmp_path_factory.mktemp("chroma"))
+
+    with patch("vector_store.chromadb.PersistentClient", return_value=mock_client):
+        with patch(
+            "vector_store.chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction"
+        ):
+            store = VectorStore(chroma_dir, "test-model", max_results=5)
+            store.course_catalog = mock_collection
+            store.course_content = mock_collection
+            return store, mock_collection
+
+
 class TestVectorStore:
     """Test cases for VectorStore class"""
 
-    @pytest.fixture
-    def mock_chroma_client(self):
-        """Create a mock ChromaDB client"""
-        mock_client = Mock()
-        mock_collection = Mock()
-        mock_client.get_or_create_collection.return_value = mock_collection
-        return mock_client, mock_collection
-
-    @pytest.fixture
-    def mock_vector_store(self, mock_chroma_client, temp_chroma_dir):
-        """Create VectorStore with mocked ChromaDB client"""
+    @pytest.fixture(autouse=True)
+    def reset_vector_store(self, mock_chroma_client, mock_vector_store):
+        """Restore the shared store and clear mock state before each test"""
         mock_client, mock_collection = mock_chroma_client
+        store, _ = mock_vector_store
 
-        with patch("vector_store.chromadb.PersistentClient", return_value=mock_client):
-            with patch(
-                "vector_store.chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction"
-            ):
-                store = VectorStore(temp_chroma_dir, "test-model", max_results=5)
-                store.course_catalog = mock_collection
-                store.course_content = mock_collection
-                return store, mock_collection
+        mock_collection.reset_mock(return_value=True, side_effect=True)
+
+        # Undo per-test reassignments made on the store itself
+        store.client = mock_client
+        store.course_catalog = mock_collection
+        store.course_content = mock_collection
+        vars(store).pop("_resolve_course_name", None)
+        yield
 
     def test_initialization(self, temp_chroma_dir):
         """Test VectorStore initialization"""
@@ -116,112 +187,49 @@ class TestVectorStore:
                 mock_client_cls.assert_called_once()
                 mock_client.get_or_create_collection.assert_called()
 
-    def test_search_basic_query(self, mock_vector_store):
-        """Test basic search without filters"""
-        store, mock_collection = mock_vector_store
-
-        mock_collection.query.return_value = {
-            "documents": [["Test document"]],
-            "metadatas": [[{"course_title": "Test Course", "lesson_number": 1}]],
-            "distances": [[0.1]],
-        }
-
-        results = store.search("test query")
-
-        mock_collection.query.assert_called_once_with(
-            query_texts=["test query"], n_results=5, where=None
-        )
-
-        assert len(results.documents) == 1
-        assert results.documents[0] == "Test document"
-        assert results.metadata[0]["course_title"] == "Test Course"
-
-    def test_search_with_course_name_resolution(self, mock_vector_store):
-        """Test search with course name that needs resolution"""
+    @pytest.mark.parametrize(
+        "search_kwargs, resolved_title, expected_query, expected_error",
+        SEARCH_CASES,
+    )
+    def test_search(
+        self,
+        mock_vector_store,
+        search_kwargs,
+        resolved_title,
+        expected_query,
+        expected_error,
+    ):
+        """Test search resolves course names and builds the content query"""
         store, mock_collection = mock_vector_store
 
         # Mock course name resolution
-        store._resolve_course_name = Mock(return_value="Full Course Title")
-
-        mock_collection.query.return_value = {
-            "documents": [["Test content"]],
-            "metadatas": [[{"course_title": "Full Course Title"}]],
-            "distances": [[0.1]],
-        }
-
-        results = store.search("test query", course_name="Partial Course")
-
-        store._resolve_course_name.assert_called_once_with("Partial Course")
-        mock_collection.query.assert_called_once_with(
-            query_texts=["test query"],
-            n_results=5,
-            where={"course_title": "Full Course Title"},
-        )
-
-    def test_search_with_course_name_not_found(self, mock_vector_store):
-        """Test search when course name cannot be resolved"""
-        store, mock_collection = mock_vector_store
-
-        store._resolve_course_name = Mock(return_value=None)
-
-        results = store.search("test query", course_name="Unknown Course")
-
-        assert results.error == "No course found matching 'Unknown Course'"
-        assert results.is_empty()
-
-    def test_search_with_lesson_number(self, mock_vector_store):
-        """Test search with lesson number filter"""
-        store, mock_collection = mock_vector_store
-
-        mock_collection.query.return_value = {
-            "documents": [["Lesson content"]],
-            "metadatas": [[{"lesson_number": 2}]],
-            "distances": [[0.1]],
-        }
-
-        results = store.search("test query", lesson_number=2)
-
-        mock_collection.query.assert_called_once_with(
-            query_texts=["test query"], n_results=5, where={"lesson_number": 2}
-        )
-
-    def test_search_with_both_filters(self, mock_vector_store):
-        """Test search with both course name and lesson number"""
-        store, mock_collection = mock_vector_store
-
-        store._resolve_course_name = Mock(return_value="Test Course")
+        store._resolve_course_name = Mock(return_value=resolved_title)
 
         mock_collection.query.return_value = {
-            "documents": [["Specific content"]],
-            "metadatas": [[{"course_title": "Test Course", "lesson_number": 3}]],
+            "documents": [["Test document"]],
+            "metadatas": [[{"course_title": "Test Course", "lesson_number": 1}]],
             "distances": [[0.1]],
         }
 
-        results = store.search("test query", course_name="Test", lesson_number=3)
-
-        expected_filter = {
-            "$and": [{"course_title": "Test Course"}, {"lesson_number": 3}]
-        }
-
-        mock_collection.query.assert_called_once_with(
-            query_texts=["test query"], n_results=5, where=expected_filter
-        )
-
-    def test_search_with_custom_limit(self, mock_vector_store):
-        """Test search with custom result limit"""
-        store, mock_collection = mock_vector_store
-
-        mock_collection.query.return_value = {
-            "documents": [[]],
-            "metadatas": [[]],
-            "distances": [[]],
-        }
-
-        store.search("test query", limit=10)
-
-        mock_collection.query.assert_called_once_with(
-            query_texts=["test query"], n_results=10, where=None
-        )
+        results = store.search("test query", **search_kwargs)
+
+        if "course_name" in search_kwargs:
+            store._resolve_course_name.assert_called_once_with(
+                search_kwargs["course_name"]
+            )
+        else:
+            store._resolve_course_name.assert_not_called()
+
+        if expected_error:
+            assert results.error == expected_error
+            assert results.is_empty()
+            mock_collection.query.assert_not_called()
+        else:
+            mock_collection.query.assert_called_once_with(
+                query_texts=["test query"], **expected_query
+            )
+            assert results.documents == ["Test document"]
+            assert results.metadata[0]["course_title"] == "Test Course"
 
     def test_search_exception_handling(self, mock_vector_store):
         """Test search exception handling"""
@@ -270,38 +278,29 @@ class TestVectorStore:
 
         assert result is None
 
-    def test_build_filter_no_params(self, mock_vector_store):
-        """Test filter building with no parameters"""
-        store, _ = mock_vector_store
-
-        result = store._build_filter(None, None)
-
-        assert result is None
-
-    def test_build_filter_course_only(self, mock_vector_store):
-        """Test filter building with course title only"""
-        store, _ = mock_vector_store
-
-        result = store._build_filter("Test Course", None)
-
-        assert result == {"course_title": "Test Course"}
-
-    def test_build_filter_lesson_only(self, mock_vector_store):
-        """Test filter building with lesson number only"""
+    @pytest.mark.parametrize(
+        "course_title, lesson_number, expected",
+        [
+            pytest.param(None, None, None, id="no_params"),
+            pytest.param(
+                "Test Course", None, {"course_title": "Test Course"}, id="course_only"
+            ),
+            pytest.param(None, 5, {"lesson_number": 5}, id="lesson_only"),
+            pytest.param(
+                "Test Course",
+                3,
+                {"$and": [{"course_title": "Test Course"}, {"lesson_number": 3}]},
+                id="both_params",
+            ),
+        ],
+    )
+    def test_build_filter(
+        self, mock_vector_store, course_title, lesson_number, expected
+    ):
+        """Test filter building for each combination of parameters"""
         store, _ = mock_vector_store
 
-        result = store._build_filter(None, 5)
-
-        assert result == {"lesson_number": 5}
-
-    def test_build_filter_both_params(self, mock_vector_store):
-        """Test filter building with both parameters"""
-        store, _ = mock_vector_store
-
-        result = store._build_filter("Test Course", 3)
-
-        expected = {"$and": [{"course_title": "Test Course"}, {"lesson_number": 3}]}
-        assert result == expected
+        assert store._build_filter(course_title, lesson_number) == expected
 
     def test_add_course_metadata(self, mock_vector_store, sample_course):
         """Test adding course metadata"""
@@ -392,40 +391,35 @@ class TestVectorStore:
         # Should not raise exception
         store.clear_all_data()
 
-    def test_get_existing_course_titles(self, mock_vector_store):
-        """Test getting existing course titles"""
+    @pytest.mark.parametrize(
+        "get_result, expected_titles",
+        [
+            pytest.param(
+                {"ids": ["Course A", "Course B", "Course C"]},
+                ["Course A", "Course B", "Course C"],
+                id="titles",
+            ),
+            pytest.param({"ids": []}, [], id="empty"),
+            pytest.param(Exception("Get failed"), [], id="exception"),
+        ],
+    )
+    def test_get_existing_course_titles(
+        self, mock_vector_store, get_result, expected_titles
+    ):
+        """Test getting existing course titles, including empty and failing catalogs"""
         store, mock_collection = mock_vector_store
         store.course_catalog = mock_collection
 
-        mock_collection.get.return_value = {"ids": ["Course A", "Course B", "Course C"]}
+        if isinstance(get_result, Exception):
+            mock_collection.get.side_effect = get_result
+        else:
+            mock_collection.get.return_value = get_result
 
         titles = store.get_existing_course_titles()
 
-        assert titles == ["Course A", "Course B", "Course C"]
+        assert titles == expected_titles
         mock_collection.get.assert_called_once()
 
-    def test_get_existing_course_titles_empty(self, mock_vector_store):
-        """Test getting course titles when none exist"""
-        store, mock_collection = mock_vector_store
-        store.course_catalog = mock_collection
-
-        mock_collection.get.return_value = {"ids": []}
-
-        titles = store.get_existing_course_titles()
-
-        assert titles == []
-
-    def test_get_existing_course_titles_exception(self, mock_vector_store):
-        """Test getting course titles with exception"""
-        store, mock_collection = mock_vector_store
-        store.course_catalog = mock_collection
-
-        mock_collection.get.side_effect = Exception("Get failed")
-
-        titles = store.get_existing_course_titles()
-
-        assert titles == []
-
     def test_get_course_count(self, mock_vector_store):
         """Test getting course count"""
         store, mock_collection = mock_vector_store
@@ -453,16 +447,12 @@ class TestVectorStore:
         store, mock_collection = mock_vector_store
         store.course_catalog = mock_collection
 
-        lessons_json = json.dumps(
-            [{"lesson_number": 1, "lesson_title": "Lesson 1", "lesson_link": "link1"}]
-        )
-
         mock_collection.get.return_value = {
             "metadatas": [
                 {
                     "title": "Test Course",
                     "instructor": "Test Instructor",
-                    "lessons_json": lessons_json,
+                    "lessons_json": LESSONS_JSON_ONE,
                     "lesson_count": 1,
                 }
             ]
@@ -507,15 +497,8 @@ class TestVectorStore:
         store, mock_collection = mock_vector_store
         store.course_catalog = mock_collection
 
-        lessons_json = json.dumps(
-            [
-                {"lesson_number": 1, "lesson_link": "https://example.com/lesson1"},
-                {"lesson_number": 2, "lesson_link": "https://example.com/lesson2"},
-            ]
-        )
-
         mock_collection.get.return_value = {
-            "metadatas": [{"lessons_json": lessons_json}]
+            "metadatas": [{"lessons_json": LESSONS_JSON_TWO}]
         }
 
         link = store.get_lesson_link("Test Course", 2)
@@ -527,12 +510,8 @@ class TestVectorStore:
         store, mock_collection = mock_vector_store
         store.course_catalog = mock_collection
 
-        lessons_json = json.dumps(
-            [{"lesson_number": 1, "lesson_link": "https://example.com/lesson1"}]
-        )
-
         mock_collection.get.return_value = {
-            "metadatas": [{"lessons_json": lessons_json}]
+            "metadatas": [{"lessons_json": LESSONS_JSON_ONE}]
         }
 
         link = store.get_lesson_link("Test Course", 5)  # Non-existent lesson
@@ -1 +1 @@
-# Scripts 模块
\ No newline at end of file
+# Scripts 模块
@@ -4,58 +4,80 @@
 自动修复格式和导入排序问题
 """
 
+import os
 import subprocess
 import sys
+from collections import deque
 from pathlib import Path
 from typing import List, Tuple
 
+try:
+    from .quality_check import changed_py_files
+except ImportError:
+    # Run directly as a file: the script's own directory is on sys.path
+    from quality_check import changed_py_files
+
 
 def run_command(cmd: List[str], description: str) -> Tuple[bool, str]:
-    """运行命令并返回结果"""
-    print(f"🔧 {description}...")
+    """运行命令并返回结果（工具输出逐行实时打印，失败时只返回末尾部分）"""
+    print(f"🔧 {description}...", flush=True)
+    tail = deque(maxlen=200)
+    # 短生命周期的工具进程：不写 .pyc，输出不缓冲
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1", "PYTHONUNBUFFERED": "1"}
     try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, check=False, cwd=Path.cwd()
-        )
-        if result.returncode == 0:
-            print(f"✅ {description} - 完成")
-            return True, result.stdout
-        else:
-            print(f"❌ {description} - 失败")
-            print(f"错误输出:\n{result.stderr}")
-            return False, result.stderr
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            cwd=Path.cwd(),
+            env=env,
+        ) as proc:
+            for line in proc.stdout:
+                sys.stdout.write(line)
+                tail.append(line)
+            returncode = proc.wait()
     except FileNotFoundError:
         print(f"❌ {description} - 命令未找到: {' '.join(cmd)}")
         return False, f"命令未找到: {' '.join(cmd)}"
+    if returncode == 0:
+        print(f"✅ {description} - 完成")
+        return True, ""
+    print(f"❌ {description} - 失败")
+    return False, "".join(tail)
 
 
 def main():
     """主函数"""
     print("🛠️  开始自动修复代码质量问题...\n")
-    
-    # 检查目标
+
+    # 检查目标：默认只修复改动过的文件，传 --all 修复全部
     targets = ["backend/", "main.py"]
-    
+    if "--all" not in sys.argv[1:]:
+        targets = changed_py_files(targets) or targets
+    print(f"📂 修复范围: {' '.join(targets)}\n")
+
+    # 直接用当前解释器运行 ruff，省去每次 uv run 的环境解析
     fixes = [
-        # Black 格式化
-        (["uv", "run", "black"] + targets, "Black 代码格式化"),
-        
-        # isort 导入排序
-        (["uv", "run", "isort"] + targets, "isort 导入排序"),
+        # Ruff 格式化（替代 Black）
+        ([sys.executable, "-m", "ruff", "format"] + targets, "Ruff 代码格式化"),
+        # Ruff 导入排序（替代 isort）
+        (
+            [sys.executable, "-m", "ruff", "check", "--select", "I", "--fix"] + targets,
+            "Ruff 导入排序",
+        ),
     ]
-    
+
     failed_fixes = []
-    
+
     for cmd, description in fixes:
-        success, output = run_command(cmd, description)
+        success, _ = run_command(cmd, description)
         if not success:
             failed_fixes.append(description)
-        else:
-            if output.strip():
-                print(f"输出: {output}")
-    
-    print("\n" + "="*50)
-    
+
+    print("\n" + "=" * 50)
+
     if failed_fixes:
         print("❌ 部分修复失败! 失败的修复项:")
         for fix in failed_fixes:
@@ -69,4 +91,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()